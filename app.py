@@ -1,5 +1,7 @@
 import sys
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, make_response
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, make_response, Response, stream_with_context, get_template_attribute, g, has_request_context
+from flask.sessions import SessionInterface, SecureCookieSession
+from flask.json.tag import TaggedJSONSerializer
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 import logging
@@ -9,11 +11,39 @@ from datetime import datetime, date, timedelta
 from threading import Timer, Thread
 from werkzeug.utils import secure_filename
 import json
-from sqlalchemy.exc import SQLAlchemyError
+import base64
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as SQLAlchemyTimeoutError
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import selectinload, joinedload, load_only
 import webbrowser
 import io
 from weasyprint import HTML
+from pdf_worker import PdfRenderer
+import pdf_worker
 import webview  # إضافة مكتبة pywebview
+import hashlib
+import unicodedata
+from urllib.parse import quote
+import importlib.util
+import multiprocessing
+import re
+from enum import IntFlag
+from functools import wraps
+from contextlib import contextmanager
+import secrets
+from itsdangerous import Signer, BadSignature
+import math
+import struct
+from collections import OrderedDict, deque
+from threading import Lock
+import mimetypes
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import statistics
+import click
+import zipfile
 
 # إعداد الـ logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,24 +52,308 @@ app = Flask(__name__)
 
 # إعدادات قاعدة البيانات
 basedir = os.path.dirname(os.path.abspath(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(basedir, "app.db")}'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', f'sqlite:///{os.path.join(basedir, "app.db")}')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
+    # الصيغة القديمة لعناوين PostgreSQL غير مدعومة في SQLAlchemy 1.4+
+    app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace('postgres://', 'postgresql://', 1)
+
+# إعدادات مجمع اتصالات قاعدة البيانات (لكل عملية من عمليات الخادم)
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # مدة انتظار اتصال متاح بالثواني
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # إعادة فتح الاتصالات الأقدم من هذه المدة بالثواني
+app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', '1') == '1'  # التحقق من صلاحية الاتصال قبل استخدامه
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+app.config['SESSION_REFRESH_INTERVAL'] = int(os.environ.get('SESSION_REFRESH_INTERVAL', 3600))  # أقل مدة بين تمديدين لجلسة لم تتغير بالثواني
+app.config['SESSION_SWEEP_INTERVAL'] = int(os.environ.get('SESSION_SWEEP_INTERVAL', 3600))  # المدة بين عمليات حذف الجلسات المنتهية بالثواني
+
+# أوضاع تشغيل SQLite: إعدادات PRAGMA يتم تطبيقها على كل اتصال جديد
+SQLITE_ENGINE_MODES = {
+    # الإعدادات الافتراضية لـ SQLite (قفل الملف بالكامل أثناء الكتابة)
+    'default': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL'
+    },
+    # WAL يسمح بالقراءة أثناء الكتابة، مع انتظار القفل بدلاً من خطأ "database is locked"
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,  # بالكيلوبايت (حوالي 64 ميجابايت)
+        'busy_timeout': 5000,  # بالمللي ثانية
+        'temp_store': 'MEMORY'
+    }
+}
+app.config['SQLITE_ENGINE_MODE'] = os.environ.get('SQLITE_ENGINE_MODE', 'production')
 
 # إعداد مجلد التحميل
 app.config['UPLOAD_FOLDER'] = os.path.join(basedir, 'uploads')
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
+app.config['ATTACHMENT_RECONCILE_INTERVAL'] = int(os.environ.get('ATTACHMENT_RECONCILE_INTERVAL', 3600))  # المدة بين عمليات مطابقة المرفقات مع الملفات على القرص بالثواني (0 للإيقاف)
+
+# إعدادات ذاكرة التخزين المؤقت لملفات PDF
+app.config['PDF_CACHE_FOLDER'] = os.path.join(basedir, 'pdf_cache')
+app.config['PDF_CACHE_MEMORY_LIMIT'] = 32 * 1024 * 1024  # الحد الأقصى للذاكرة بالبايت
+app.config['PDF_CACHE_DISK_LIMIT'] = 256 * 1024 * 1024  # الحد الأقصى للقرص بالبايت
+
+# إعدادات تجزئة كلمات المرور (الطريقة وعامل التكلفة يحفظان داخل قيمة التجزئة نفسها)
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # مثل scrypt:N:r:p أو pbkdf2:sha256:iterations
+app.config['PASSWORD_SALT_LENGTH'] = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+
+# إعدادات فحص كلمات المرور الشائعة عند التسجيل
+app.config['PASSWORD_BLOCKLIST_FILE'] = os.path.join(basedir, 'data', 'common_passwords.txt')
+app.config['PASSWORD_FILTER_FILE'] = os.path.join(basedir, 'data', 'common_passwords.bloom')  # يتم بناؤه بالأمر flask build-password-filter
+app.config['PASSWORD_FILTER_FALSE_POSITIVE_RATE'] = 0.001
+
+# إعدادات ذاكرة التخزين المؤقت العامة (الإحصائيات ولوحات المعلومات)
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')  # memory لكل عملية أو filesystem مشتركة بين العمليات
+app.config['CACHE_FOLDER'] = os.environ.get('CACHE_FOLDER', os.path.join(basedir, 'cache'))
+app.config['CACHE_DEFAULT_TTL'] = int(os.environ.get('CACHE_DEFAULT_TTL', 300))  # مدة الصلاحية الافتراضية بالثواني
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+
+# إعدادات خدمة تحويل ملفات PDF في عمليات منفصلة
+app.config['PDF_RENDER_WORKERS'] = int(os.environ.get('PDF_RENDER_WORKERS', min(os.cpu_count() or 1, 2)))  # 0 للتحويل داخل نفس العملية
+app.config['PDF_RENDER_TIMEOUT'] = 120  # أقصى مدة انتظار لتحويل ملف واحد بالثواني
+app.config['PDF_JOB_TTL'] = 600  # مدة الاحتفاظ بنتائج المهام المنتهية بالثواني
+app.config['PDF_PRERENDER_WAIT'] = 2  # مدة انتظار التحويل المسبق قبل التحويل المباشر بالثواني
+app.config['PDF_BASE_URL'] = os.path.join(basedir, 'static') + os.sep  # مسار ثابت للموارد النسبية داخل ملفات PDF
+app.config['PDF_FONT_FILES'] = {  # خطوط يتم تحميلها مرة واحدة لكل عملية بدلاً من البحث عنها في خطوط النظام (مرفقة في static/fonts)
+    'DejaVu Sans': {
+        'normal': os.environ.get('PDF_FONT_PATH', os.path.join(basedir, 'static', 'fonts', 'DejaVuSans.ttf')),
+        'bold': os.environ.get('PDF_BOLD_FONT_PATH', os.path.join(basedir, 'static', 'fonts', 'DejaVuSans-Bold.ttf'))
+    }
+}
+app.config['PDF_FULL_FONTS'] = False  # False لتضمين الحروف المستخدمة فقط من كل خط (subsetting، وهو السلوك الافتراضي في WeasyPrint)
+app.config['PDF_FONT_HINTING'] = False  # حذف بيانات hinting غير المستخدمة في الطباعة (الافتراضي في WeasyPrint أيضاً)
+
+# إعدادات التصدير المجمع للقرارات
+app.config['BULK_EXPORT_FOLDER'] = os.path.join(basedir, 'exports')
+app.config['BULK_EXPORT_MAX_DECISIONS'] = 500
+
+# إعدادات التقارير
+app.config['REPORT_FONT_PATH'] = os.environ.get('REPORT_FONT_PATH', os.path.join(basedir, 'static', 'fonts', 'DejaVuSans.ttf'))
+app.config['REPORT_CHUNK_SIZE'] = 500  # عدد السجلات المقروءة من قاعدة البيانات في كل دفعة
+
+# إعدادات تقسيم القوائم إلى صفحات
+app.config['PAGE_SIZE'] = 50  # عدد العناصر في الصفحة الواحدة افتراضياً
+app.config['PAGE_SIZE_MAX'] = 200  # الحد الأقصى لعدد العناصر الذي يمكن طلبه عبر ?limit=
+
+# إعدادات مراقبة استعلامات SQL
+app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))  # تسجيل الاستعلامات الأبطأ من هذه المدة
+app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', os.path.join(basedir, 'logs', 'slow_queries.log'))
+app.config['QUERY_STATS_WINDOW'] = int(os.environ.get('QUERY_STATS_WINDOW', 200))  # عدد الطلبات الأخيرة المحفوظة لكل مسار
+
+# تحميل إعدادات إضافية من ملف يحدده متغير البيئة APP_CONFIG_FILE (يتجاوز القيم السابقة)
+app.config.from_envvar('APP_CONFIG_FILE', silent=True)
+if app.config['SQLITE_ENGINE_MODE'] not in SQLITE_ENGINE_MODES:
+    raise ValueError(
+        f"قيمة SQLITE_ENGINE_MODE غير معروفة: {app.config['SQLITE_ENGINE_MODE']!r} "
+        f"(القيم المسموح بها: {', '.join(SQLITE_ENGINE_MODES)})"
+    )
+app.config.setdefault('SQLITE_PRAGMAS', SQLITE_ENGINE_MODES[app.config['SQLITE_ENGINE_MODE']])
+
+# إحصائيات مجمع اتصالات قاعدة البيانات
+class DatabasePoolMetrics:
+    """عدادات حجز الاتصالات وإرجاعها ومدة انتظار الحصول على اتصال من المجمع"""
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = Lock()
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self, pool=None):
+        with self._lock:
+            data = {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'wait_total_ms': round(self.wait_total * 1000, 2),
+                'wait_avg_ms': round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0,
+                'wait_max_ms': round(self.wait_max * 1000, 2)
+            }
+        if isinstance(pool, QueuePool):
+            data.update(pool_size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow(), idle=pool.checkedin())
+        return data
+
+db_pool_metrics = DatabasePoolMetrics()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool يقيس المدة التي ينتظرها الطلب للحصول على اتصال"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except SQLAlchemyTimeoutError:
+            db_pool_metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        db_pool_metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+def build_engine_options(config):
+    """إعدادات مجمع الاتصالات لقواعد البيانات التي تستخدم QueuePool"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+
+# القيم المحددة صراحة في SQLALCHEMY_ENGINE_OPTIONS (من ملف الإعدادات) لها الأولوية
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    **build_engine_options(app.config),
+    **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+}
 
 # تهيئة قاعدة البيانات
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, directory=os.path.join(basedir, 'migrations'))
+
+# إحصائيات استعلامات SQL لكل مسار على آخر عدد محدد من الطلبات
+class RouteQueryStats:
+    """عدد الاستعلامات وزمن قاعدة البيانات والزمن الكلي لآخر الطلبات في كل مسار"""
+
+    def __init__(self, window):
+        self.window = window
+        self.routes = {}
+        self._lock = Lock()
+
+    def record(self, route, query_count, db_seconds, total_seconds):
+        with self._lock:
+            samples = self.routes.setdefault(route, deque(maxlen=self.window))
+            samples.append((query_count, db_seconds, total_seconds))
+
+    def stats(self):
+        with self._lock:
+            routes = {route: list(samples) for route, samples in self.routes.items()}
+
+        data = {}
+        for route, samples in routes.items():
+            counts = [s[0] for s in samples]
+            db_times = sorted(s[1] * 1000 for s in samples)
+            total_times = [s[2] * 1000 for s in samples]
+            data[route] = {
+                'requests': len(samples),
+                'queries_avg': round(statistics.mean(counts), 2),
+                'queries_max': max(counts),
+                'db_ms_avg': round(statistics.mean(db_times), 2),
+                'db_ms_p95': round(db_times[min(len(db_times) - 1, int(len(db_times) * 0.95))], 2),
+                'db_ms_max': round(db_times[-1], 2),
+                'total_ms_avg': round(statistics.mean(total_times), 2)
+            }
+        return data
+
+route_query_stats = RouteQueryStats(app.config['QUERY_STATS_WINDOW'])
+
+# سجل الاستعلامات البطيئة في ملف منفصل عن سجل التطبيق
+slow_query_logger = logging.getLogger('slow_queries')
+slow_query_logger.propagate = False
+
+def get_slow_query_logger():
+    if not slow_query_logger.handlers:
+        os.makedirs(os.path.dirname(app.config['SLOW_QUERY_LOG']), exist_ok=True)
+        handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'], encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+    return slow_query_logger
+
+def explain_statement(conn, statement, parameters):
+    """خطة تنفيذ الاستعلام عبر اتصال DBAPI مباشرة حتى لا تمر بأحداث SQLAlchemy مرة أخرى"""
+    if not statement.lstrip().upper().startswith('SELECT'):
+        return []
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [str(row[-1]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def log_slow_query(conn, statement, parameters, seconds, executemany):
+    try:
+        plan = [] if executemany else explain_statement(conn, statement, parameters)
+    except Exception as e:
+        plan = [f'تعذر الحصول على خطة التنفيذ: {e}']
+
+    route = request.endpoint if has_request_context() else 'cli'
+    lines = [f'{seconds * 1000:.1f} ms | {route}', statement.strip(), f'params: {parameters!r}']
+    lines += [f'plan: {line}' for line in plan]
+    get_slow_query_logger().info('\n'.join(lines))
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_start_time'].pop()
+    if has_request_context():
+        g.sql_query_count = g.get('sql_query_count', 0) + 1
+        g.sql_query_time = g.get('sql_query_time', 0.0) + seconds
+    if seconds * 1000 >= app.config['SLOW_QUERY_THRESHOLD_MS']:
+        log_slow_query(conn, statement, parameters, seconds, executemany)
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """تطبيق إعدادات وضع SQLite المختار عند فتح كل اتصال"""
+    apply_sqlite_pragmas(dbapi_connection, app.config['SQLITE_PRAGMAS'])
+
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        db.event.listen(db.engine, 'connect', set_sqlite_pragmas)
+
+    db.event.listen(db.engine, 'connect', lambda *args: db_pool_metrics.increment('connects'))
+    db.event.listen(db.engine, 'checkout', lambda *args: db_pool_metrics.increment('checkouts'))
+    db.event.listen(db.engine, 'checkin', lambda *args: db_pool_metrics.increment('checkins'))
+    db.event.listen(db.engine, 'invalidate', lambda *args: db_pool_metrics.increment('invalidations'))
+
+    db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    db.event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
 
 def init_db():
+    from flask_migrate import upgrade, stamp
+
     try:
-        # إنشاء جداول قاعدة البيانات
         with app.app_context():
-            db.create_all()
+            if not db.inspect(db.engine).get_table_names():
+                # قاعدة بيانات جديدة: إنشاء الجداول بالشكل الحالي وتسجيلها على آخر ترحيل
+                db.create_all()
+                stamp()
+            else:
+                # قاعدة بيانات موجودة: تطبيق الترحيلات التي لم تطبق بعد (مثل الفهارس الجديدة)
+                upgrade()
+                db.create_all()
             
             # التحقق من وجود مستخدمين
             if not User.query.first():
@@ -61,10 +375,58 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# التصفح بالمؤشر (keyset) على (عمود الترتيب، id) بترتيب تنازلي
+# يجب أن يكون عمود الترتيب غير قابل لـ NULL، فلا يمكن تمثيل NULL في المؤشر ولا في شرط المقارنة
+def encode_cursor(sort_value, row_id):
+    payload = json.dumps([sort_value.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(token):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError, UnicodeEncodeError):
+        raise InvalidCursorError('مؤشر الصفحة غير صالح')
+
+def keyset_page(query, sort_column, id_column):
+    """جلب صفحة واحدة بعد المؤشر المرسل في ?cursor= وإرجاع (الصفوف، مؤشر الصفحة التالية)"""
+    limit = max(1, min(request.args.get('limit', app.config['PAGE_SIZE'], type=int), app.config['PAGE_SIZE_MAX']))
+    cursor = request.args.get('cursor')
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(db.or_(
+            sort_column < sort_value,
+            db.and_(sort_column == sort_value, id_column < row_id)
+        ))
+
+    rows = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], sort_column.key), getattr(rows[-1], id_column.key))
+    return rows, next_cursor
+
+def render_rows(macro_name, items):
+    """تحويل عناصر صفحة إلى HTML باستخدام نفس الماكرو المستخدم في القالب"""
+    macro = get_template_attribute('list_rows.html', macro_name)
+    return ''.join(str(macro(item)) for item in items)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def save_uploaded_file(file, folder=''):
+def guess_mime_type(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+def file_checksum(file_path):
+    """حساب بصمة SHA-256 لملف على دفعات"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def save_uploaded_file(file, folder='', request_obj=None):
+    """حفظ الملف على القرص وإضافة بياناته إلى جدول المرفقات (يتم حفظها مع commit الخاص بالمسار)"""
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         # إضافة timestamp لمنع تكرار أسماء الملفات
@@ -81,6 +443,15 @@ def save_uploaded_file(file, folder=''):
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             
         file.save(file_path)
+        db.session.add(Attachment(
+            request=request_obj,
+            filename=filename,
+            folder=folder,
+            size=os.path.getsize(file_path),
+            mime_type=guess_mime_type(filename),
+            checksum=file_checksum(file_path),
+            uploaded_by=session['user_id']
+        ))
         return filename
     return None
 
@@ -109,22 +480,118 @@ class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(100), nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    roles = db.Column(db.String(100), nullable=False)
+    # الأعمدة المعرفة بـ active_history تحمل قيمتها السابقة عند التعديل ليتم تحديث عدادات الإحصائيات (StatCounter)
+    roles = db.mapped_column(db.String(100), nullable=False, active_history=True)
     governorate = db.Column(db.String(100), nullable=False)
-    active = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    active = db.mapped_column(db.Boolean, default=False, active_history=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def password_needs_rehash(self):
+        return self.password_hash.split('$', 1)[0] != password_hash_prefix(app.config['PASSWORD_HASH_METHOD'])
+
+# تجزئة كلمات المرور حسب الإعدادات الحالية
+password_hash_prefixes = {}
+
+def password_hash_prefix(method):
+    """الصيغة الكاملة للطريقة كما تحفظ في بداية التجزئة (مثل scrypt -> scrypt:32768:8:1)"""
+    if method not in password_hash_prefixes:
+        password_hash_prefixes[method] = generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+    return password_hash_prefixes[method]
+
+def hash_password(password):
+    return generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'], salt_length=app.config['PASSWORD_SALT_LENGTH'])
+
+# الصلاحيات: يتم تحويل أدوار المستخدم إلى قناع بتات مرة واحدة عند تسجيل الدخول
+class Permission(IntFlag):
+    MANAGE_USERS = 1 << 0  # تفعيل المستخدمين وعرض المستخدمين المنتظرين
+    VIEW_SYSTEM_STATS = 1 << 1  # الإحصائيات ومراقبة قاعدة البيانات وذاكرة التخزين المؤقت
+    MANAGE_REQUESTS = 1 << 2  # عرض جميع الطلبات ومرفقاتها ومعالجتها وتحويلها وردها
+    APPROVE_EVALUATIONS = 1 << 3  # اعتماد التقييمات ورفضها
+    GENERATE_REPORTS = 1 << 4
+    MANAGE_INTERVIEWS = 1 << 5  # جدولة المقابلات وتعديلها وعرض جميع المقابلات
+
+# جدول الأدوار: المصدر الوحيد لصلاحيات كل دور
+ROLE_PERMISSIONS = {
+    'governor': ~Permission(0),  # جميع الصلاحيات
+    'general_admin': ~Permission(0),
+    'central_admin': (Permission.VIEW_SYSTEM_STATS | Permission.MANAGE_REQUESTS | Permission.APPROVE_EVALUATIONS |
+                      Permission.GENERATE_REPORTS | Permission.MANAGE_INTERVIEWS),
+    'hr_admin': Permission.MANAGE_INTERVIEWS
+}
+
+def parse_roles(roles):
+    """استخراج أسماء الأدوار من القيمة المخزنة مثل '"governor"' أو '["user"]'"""
+    if not roles:
+        return []
+    return re.findall(r'"([^"]+)"', roles) or [roles.strip()]
+
+def permissions_for_roles(roles):
+    permissions = Permission(0)
+    for role in parse_roles(roles):
+        permissions |= ROLE_PERMISSIONS.get(role, Permission(0))
+    return int(permissions)
+
+def has_permissions(permissions):
+    """التحقق من أن المستخدم الحالي يملك جميع الصلاحيات المطلوبة"""
+    granted = session.get('permissions')
+    if granted is None:
+        if 'roles' not in session:
+            return False
+        # جلسات سابقة لتخزين الصلاحيات: حسابها مرة واحدة وحفظها
+        granted = session['permissions'] = permissions_for_roles(session['roles'])
+    return granted & permissions == permissions
+
+def require_permissions(permissions, message, redirect_endpoint=None):
+    """التحقق من تسجيل الدخول والصلاحيات قبل تنفيذ المسار؛ يعيد JSON أو يحول إلى redirect_endpoint مع رسالة"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if 'user_id' not in session:
+                if redirect_endpoint:
+                    flash('يرجى تسجيل الدخول أولاً', 'error')
+                    return redirect(url_for('index'))
+                return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
+
+            if not has_permissions(permissions):
+                if redirect_endpoint:
+                    flash(message, 'error')
+                    return redirect(url_for(redirect_endpoint))
+                return jsonify({'success': False, 'message': message})
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# إعادة تجزئة كلمات المرور القديمة في الخلفية حتى لا يتأخر تسجيل الدخول
+password_rehash_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='password-rehash')
+
+def rehash_password(user_id, old_hash, password):
+    with app.app_context():
+        try:
+            # التحديث فقط إذا لم تتغير كلمة المرور منذ تسجيل الدخول
+            updated = User.query.filter_by(id=user_id, password_hash=old_hash).update(
+                {'password_hash': hash_password(password)}, synchronize_session=False
+            )
+            db.session.commit()
+            if updated:
+                logging.info(f"تمت إعادة تجزئة كلمة مرور المستخدم {user_id} بالإعدادات الحالية.")
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"خطأ أثناء إعادة تجزئة كلمة مرور المستخدم {user_id}: {e}")
+
 # نموذج قرار تعيين
 class AppointmentDecision(db.Model):
     __tablename__ = 'appointment_decisions'
+    __table_args__ = (
+        db.Index('ix_appointment_decisions_user_status_created', 'user_id', 'status', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     announcement_number = db.Column(db.String(50), nullable=False)
@@ -147,42 +614,15 @@ class AppointmentDecision(db.Model):
 # نموذج لجنة وظائف قيادية
 class LeadershipCommittee(db.Model):
     __tablename__ = 'leadership_committees'
+    __table_args__ = (
+        db.Index('ix_leadership_committees_user_status_created', 'user_id', 'status', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     decision_number = db.Column(db.String(50), nullable=False)
     decision_date = db.Column(db.Date, nullable=False)
     preamble = db.Column(db.Text, nullable=False)
-    chairperson_name = db.Column(db.String(100), nullable=False)
-    chairperson_national_id = db.Column(db.String(14), nullable=False)
-    chairperson_phone = db.Column(db.String(11), nullable=False)
-    admin_member_name = db.Column(db.String(100), nullable=False)
-    admin_member_national_id = db.Column(db.String(14), nullable=False)
-    admin_member_phone = db.Column(db.String(11), nullable=False)
-    hr_member_name = db.Column(db.String(100), nullable=False)
-    hr_member_national_id = db.Column(db.String(14), nullable=False)
-    hr_member_phone = db.Column(db.String(11), nullable=False)
-    it_member_name = db.Column(db.String(100), nullable=False)
-    it_member_national_id = db.Column(db.String(14), nullable=False)
-    it_member_phone = db.Column(db.String(11), nullable=False)
-    legal_member_name = db.Column(db.String(100), nullable=False)
-    legal_member_national_id = db.Column(db.String(14), nullable=False)
-    legal_member_phone = db.Column(db.String(11), nullable=False)
-    other_member_1_name = db.Column(db.String(100), nullable=False)
-    other_member_1_national_id = db.Column(db.String(14), nullable=False)
-    other_member_1_phone = db.Column(db.String(11), nullable=False)
-    other_member_2_name = db.Column(db.String(100), nullable=False)
-    other_member_2_national_id = db.Column(db.String(14), nullable=False)
-    other_member_2_phone = db.Column(db.String(11), nullable=False)
     article_one_text = db.Column(db.Text, nullable=False)
-    secretary_name = db.Column(db.String(100), nullable=False)
-    secretary_national_id = db.Column(db.String(14), nullable=False)
-    secretary_phone = db.Column(db.String(11), nullable=False)
-    secretary_member_1_name = db.Column(db.String(100), nullable=False)
-    secretary_member_1_national_id = db.Column(db.String(14), nullable=False)
-    secretary_member_1_phone = db.Column(db.String(11), nullable=False)
-    secretary_member_2_name = db.Column(db.String(100), nullable=False)
-    secretary_member_2_national_id = db.Column(db.String(14), nullable=False)
-    secretary_member_2_phone = db.Column(db.String(11), nullable=False)
     article_two_text = db.Column(db.Text, nullable=False)
     committee_tasks = db.Column(db.Text, nullable=False)
     article_four = db.Column(db.Text, nullable=False)
@@ -193,22 +633,81 @@ class LeadershipCommittee(db.Model):
     # إضافة حقل governorate
     governorate = db.Column(db.String(100), nullable=False)  # نفس النوع المستخدم في AppointmentDecision
 
+    # أعضاء اللجنة لا يتم تحميلهم إلا عند الحاجة (باستخدام selectinload في الاستعلامات التي تعرضهم)
+    members = db.relationship('CommitteeMember', backref='committee', cascade='all, delete-orphan', order_by='CommitteeMember.id')
+
+# أدوار أعضاء اللجنة بالترتيب الذي تظهر به في النموذج وملف PDF
+COMMITTEE_ROLES = [
+    ('chairperson', 'رئيس اللجنة'),
+    ('admin_member', 'عضو الإدارة'),
+    ('hr_member', 'عضو الموارد البشرية'),
+    ('it_member', 'عضو تكنولوجيا المعلومات'),
+    ('legal_member', 'عضو القانون'),
+    ('other_member_1', 'عضو آخر 1'),
+    ('other_member_2', 'عضو آخر 2'),
+    ('secretary', 'أمين اللجنة'),
+    ('secretary_member_1', 'عضو أمانة 1'),
+    ('secretary_member_2', 'عضو أمانة 2')
+]
+SECRETARIAT_ROLES = {'secretary', 'secretary_member_1', 'secretary_member_2'}
+
+# نموذج عضو لجنة وظائف قيادية
+class CommitteeMember(db.Model):
+    __tablename__ = 'committee_members'
+    __table_args__ = (
+        db.UniqueConstraint('committee_id', 'role', name='uq_committee_members_committee_role'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    committee_id = db.Column(db.Integer, db.ForeignKey('leadership_committees.id', ondelete='CASCADE'), nullable=False)
+    role = db.Column(db.String(50), nullable=False)  # أحد مفاتيح COMMITTEE_ROLES
+    name = db.Column(db.String(100), nullable=False)
+    national_id = db.Column(db.String(14), nullable=False)
+    phone = db.Column(db.String(11), nullable=False)
+
+def committee_members_from(data):
+    """استخراج أعضاء اللجنة من بيانات بالشكل المسطح (نموذج الإدخال أو قاموس القرار)"""
+    return [
+        {
+            'role': role,
+            'name': data[f'{role}_name'],
+            'national_id': data[f'{role}_national_id'],
+            'phone': data[f'{role}_phone']
+        }
+        for role, _ in COMMITTEE_ROLES
+    ]
+
+def add_committee_with_members(committee, members):
+    """إضافة اللجنة ثم إدخال جميع أعضائها بعملية إدخال واحدة"""
+    db.session.add(committee)
+    db.session.flush()
+    db.session.execute(db.insert(CommitteeMember), [dict(member, committee_id=committee.id) for member in members])
+
 # نموذج الوظيفة
 class Job(db.Model):
     __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_user_id', 'user_id'),
+        db.Index('ix_jobs_status', 'status'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     job_title = db.Column(db.String(100), nullable=False)
     job_code = db.Column(db.String(50), nullable=False, unique=True)
     job_description = db.Column(db.Text, nullable=False)
     deadline = db.Column(db.Date, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     governorate = db.Column(db.String(100), nullable=False)
-    status = db.Column(db.String(50), default='pending')  # إضافة حقل الحالة (pending, in_progress, completed)
+    status = db.mapped_column(db.String(50), default='pending', active_history=True)  # إضافة حقل الحالة (pending, in_progress, completed)
+
+# أعمدة الوظيفة المعروضة في القوائم (بدون وصف الوظيفة الذي يتم جلبه عند عرض التفاصيل)
+JOB_LIST_COLUMNS = (Job.id, Job.user_id, Job.job_title, Job.job_code, Job.status, Job.deadline, Job.created_at, Job.governorate)
 
 # نموذج حالة الوظيفة
 class JobStatus(db.Model):
     __tablename__ = 'job_statuses'
+    __table_args__ = (
+        db.Index('ix_job_statuses_job_created', 'job_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False)
     status = db.Column(db.String(50), nullable=False)  # pending, in_progress, completed, rejected
@@ -301,66 +800,761 @@ def create_sample():
         logging.error(f"خطأ في إنشاء بيانات العينة: {e}")
         raise
 
-# تهيئة قاعدة البيانات عند بدء التطبيق
-with app.app_context():
-    db.create_all()
+# ذاكرة تخزين مؤقت لملفات PDF المولدة (في الذاكرة وعلى القرص)
+class PdfRenderCache:
+    """تخزين ملفات PDF حسب نوع القرار ورقمه وبصمة الحقول المعروضة مع إخلاء LRU"""
+
+    def __init__(self, folder, memory_limit, disk_limit, version=''):
+        self.folder = folder
+        # بصمة القوالب وملفات الأنماط: تغييرها يغير جميع المفاتيح فلا تُستخدم الملفات المحولة بالقوالب القديمة
+        self.version = version
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        self._lock = Lock()
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        # تحميل فهرس الملفات الموجودة على القرص مرتبة من الأقدم للأحدث
+        entries = []
+        for name in os.listdir(folder):
+            if name.endswith('.pdf'):
+                path = os.path.join(folder, name)
+                entries.append((os.path.getmtime(path), name[:-4], os.path.getsize(path)))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+
+    def make_key(self, decision_type, user_id, decision_id, data):
+        fields = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+        digest = hashlib.sha256(f"{self.version}:{fields}".encode('utf-8')).hexdigest()
+        return f"{decision_type}_{user_id}_{decision_id}_{digest}"
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.pdf")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+            if key in self._disk:
+                try:
+                    with open(self._path(key), 'rb') as f:
+                        pdf_bytes = f.read()
+                except OSError as e:
+                    logging.warning(f"تعذر قراءة ملف PDF من ذاكرة التخزين المؤقت: {e}")
+                    self._disk_size -= self._disk.pop(key)
+                else:
+                    os.utime(self._path(key))
+                    self._disk.move_to_end(key)
+                    self._store_in_memory(key, pdf_bytes)
+                    self.hits += 1
+                    return pdf_bytes
+
+            self.misses += 1
+            return None
+
+    def put(self, key, pdf_bytes):
+        with self._lock:
+            self._store_in_memory(key, pdf_bytes)
+
+            if key in self._disk or len(pdf_bytes) > self.disk_limit:
+                return
+            try:
+                with open(self._path(key), 'wb') as f:
+                    f.write(pdf_bytes)
+            except OSError as e:
+                logging.warning(f"تعذر حفظ ملف PDF في ذاكرة التخزين المؤقت: {e}")
+                return
+            self._disk[key] = len(pdf_bytes)
+            self._disk_size += len(pdf_bytes)
+
+            while self._disk_size > self.disk_limit:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_size -= old_size
+                self._remove_file(old_key)
+
+    def _store_in_memory(self, key, pdf_bytes):
+        if len(pdf_bytes) > self.memory_limit:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = pdf_bytes
+        self._memory_size += len(pdf_bytes)
 
-# دالة لتوليد PDF
-def generate_pdf(data=None, data_type='committee'):
-    buffer = io.BytesIO()
+        while self._memory_size > self.memory_limit:
+            _, old_bytes = self._memory.popitem(last=False)
+            self._memory_size -= len(old_bytes)
 
-    if not data:
-        html_content = "<html><body><p style='text-align: right; font-family: DejaVu Sans, Arial, sans-serif;'>لا توجد بيانات متاحة</p></body></html>"
-        HTML(string=html_content).write_pdf(buffer)
-        buffer.seek(0)
-        return buffer
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def invalidate(self, decision_type, user_id):
+        """حذف جميع ملفات PDF المخزنة لنوع قرار معين لمستخدم معين"""
+        prefix = f"{decision_type}_{user_id}_"
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                self._memory_size -= len(self._memory.pop(key))
+            for key in [k for k in self._disk if k.startswith(prefix)]:
+                self._disk_size -= self._disk.pop(key)
+                self._remove_file(key)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_size
+            }
 
-    if data_type == 'committee':
-        members = [
-            {"title": "رئيس اللجنة", "name": data['chairperson_name'], "national_id": data['chairperson_national_id'], "phone": data['chairperson_phone']},
-            {"title": "عضو الإدارة", "name": data['admin_member_name'], "national_id": data['admin_member_national_id'], "phone": data['admin_member_phone']},
-            {"title": "عضو الموارد البشرية", "name": data['hr_member_name'], "national_id": data['hr_member_national_id'], "phone": data['hr_member_phone']},
-            {"title": "عضو تكنولوجيا المعلومات", "name": data['it_member_name'], "national_id": data['it_member_national_id'], "phone": data['it_member_phone']},
-            {"title": "عضو القانون", "name": data['legal_member_name'], "national_id": data['legal_member_national_id'], "phone": data['legal_member_phone']},
-            {"title": "عضو آخر 1", "name": data['other_member_1_name'], "national_id": data['other_member_1_national_id'], "phone": data['other_member_1_phone']},
-            {"title": "عضو آخر 2", "name": data['other_member_2_name'], "national_id": data['other_member_2_national_id'], "phone": data['other_member_2_phone']},
-        ]
+def pdf_template_version():
+    """بصمة قوالب PDF وملفات الأنماط المستخدمة في التحويل (يتم حسابها مرة واحدة عند التشغيل)"""
+    css_folder = os.path.join(app.static_folder, 'css')
+    paths = [os.path.join(app.root_path, app.template_folder, name) for name in ('pdf_template.html', 'appointment_pdf_template.html')]
+    paths += [os.path.join(css_folder, name) for name in sorted(os.listdir(css_folder)) if name.endswith('.css')]
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    # ملفات الخطوط كبيرة، لذا يكفي مسارها وحجمها (أو عدم وجودها)
+    for family, files in sorted(app.config['PDF_FONT_FILES'].items()):
+        for weight, path in sorted(files.items() if isinstance(files, dict) else [('normal', files)]):
+            size = os.path.getsize(path) if os.path.exists(path) else None
+            digest.update(f'{family}:{weight}:{path}:{size}'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+pdf_cache = PdfRenderCache(
+    app.config['PDF_CACHE_FOLDER'],
+    app.config['PDF_CACHE_MEMORY_LIMIT'],
+    app.config['PDF_CACHE_DISK_LIMIT'],
+    version=pdf_template_version()
+)
+
+# ذاكرة تخزين مؤقت عامة للبيانات التي تتغير نادراً (مثل الإحصائيات)
+class MemoryCacheBackend:
+    """تخزين القيم في ذاكرة العملية الحالية مع إخلاء LRU عند تجاوز عدد العناصر"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+class FileSystemCacheBackend:
+    """تخزين القيم كملفات JSON في مجلد مشترك بين عمليات الخادم"""
+
+    def __init__(self, folder, max_entries):
+        self.folder = folder
+        self.max_entries = max_entries
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.folder, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, entry):
+        # الكتابة في ملف مؤقت ثم استبداله حتى لا تقرأ عملية أخرى ملفاً غير مكتمل
+        path = self._path(key)
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, default=str)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logging.warning(f"تعذر حفظ القيمة في ذاكرة التخزين المؤقت: {e}")
+            return
+        self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def size(self):
+        return sum(1 for name in os.listdir(self.folder) if name.endswith('.json'))
 
-        secretaries = [
-            {"title": "أمين اللجنة", "name": data['secretary_name'], "national_id": data['secretary_national_id'], "phone": data['secretary_phone']},
-            {"title": "عضو أمانة 1", "name": data['secretary_member_1_name'], "national_id": data['secretary_member_1_national_id'], "phone": data['secretary_member_1_phone']},
-            {"title": "عضو أمانة 2", "name": data['secretary_member_2_name'], "national_id": data['secretary_member_2_national_id'], "phone": data['secretary_member_2_phone']},
+    def _prune(self):
+        files = [os.path.join(self.folder, name) for name in os.listdir(self.folder) if name.endswith('.json')]
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+class Cache:
+    """ذاكرة تخزين مؤقت بمدة صلاحية ووسوم (tags) يمكن إلغاؤها عند تعديل البيانات المرتبطة بها"""
+
+    def __init__(self, backend, default_ttl):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.invalidations = 0
+        self._lock = Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _tag_version(self, tag):
+        # إصدار الوسم يتغير عند إلغائه، والقيم المخزنة بإصدار قديم تعتبر منتهية
+        entry = self.backend.get(f'tag:{tag}')
+        if entry is None:
+            entry = {'version': uuid.uuid4().hex}
+            self.backend.set(f'tag:{tag}', entry)
+        return entry['version']
+
+    def get(self, key):
+        entry = self.backend.get(f'value:{key}')
+        if entry is None or entry['expires_at'] < time.time() or any(
+            self._tag_version(tag) != version for tag, version in entry['tags'].items()
+        ):
+            self._count('misses')
+            return None
+        self._count('hits')
+        return entry['value']
+
+    def set(self, key, value, ttl=None, tags=()):
+        self.backend.set(f'value:{key}', {
+            'value': value,
+            'expires_at': time.time() + (ttl or self.default_ttl),
+            'tags': {tag: self._tag_version(tag) for tag in tags}
+        })
+        self._count('sets')
+
+    def get_or_set(self, key, compute, ttl=None, tags=()):
+        """قراءة القيمة من ذاكرة التخزين المؤقت أو حسابها وتخزينها عند عدم وجودها"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value, ttl, tags)
+        return value
+
+    def delete(self, key):
+        self.backend.delete(f'value:{key}')
+
+    def invalidate_tags(self, *tags):
+        for tag in tags:
+            self.backend.set(f'tag:{tag}', {'version': uuid.uuid4().hex})
+            self._count('invalidations')
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            data = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0,
+                'sets': self.sets,
+                'invalidations': self.invalidations
+            }
+        data.update(backend=type(self.backend).__name__, entries=self.backend.size())
+        return data
+
+def create_cache():
+    if app.config['CACHE_BACKEND'] == 'filesystem':
+        backend = FileSystemCacheBackend(app.config['CACHE_FOLDER'], app.config['CACHE_MAX_ENTRIES'])
+    else:
+        backend = MemoryCacheBackend(app.config['CACHE_MAX_ENTRIES'])
+    return Cache(backend, app.config['CACHE_DEFAULT_TTL'])
+
+cache = create_cache()
+
+def pdf_renderer_settings():
+    """إعدادات PdfRenderer التي يتم تمريرها إلى عمليات خدمة التحويل"""
+    return {
+        'css_folder': os.path.join(app.static_folder, 'css'),
+        'base_url': app.config['PDF_BASE_URL'],
+        'font_files': app.config['PDF_FONT_FILES'],
+        'full_fonts': app.config['PDF_FULL_FONTS'],
+        'hinting': app.config['PDF_FONT_HINTING']
+    }
+
+def create_pdf_renderer():
+    return PdfRenderer(**pdf_renderer_settings())
+
+# محول العملية الرئيسية (للتحويل المباشر وأوامر القياس)
+pdf_renderer = create_pdf_renderer()
+
+def render_html_to_pdf(html_content, data_type=None):
+    return pdf_renderer.render(html_content, data_type)
+
+# إحصائيات أحجام ملفات PDF المولدة حسب نوع القرار
+pdf_size_stats = {}
+pdf_size_stats_lock = Lock()
+
+def record_pdf_size(render_type, size):
+    render_type = render_type or 'no_data'
+    with pdf_size_stats_lock:
+        entry = pdf_size_stats.setdefault(render_type, {'count': 0, 'total_bytes': 0, 'max_bytes': 0})
+        entry['count'] += 1
+        entry['total_bytes'] += size
+        entry['max_bytes'] = max(entry['max_bytes'], size)
+    logging.info(f"تم إنشاء ملف PDF من نوع {render_type} بحجم {size / 1024:.1f} KB")
+
+def get_pdf_size_stats():
+    with pdf_size_stats_lock:
+        return {
+            render_type: dict(entry, average_bytes=entry['total_bytes'] // entry['count'])
+            for render_type, entry in pdf_size_stats.items()
+        }
+
+# خدمة تحويل ملفات PDF باستخدام مجموعة عمليات
+pdf_executor = None
+pdf_executor_lock = Lock()
+pdf_jobs = {}
+pdf_jobs_lock = Lock()
+pdf_prerenders = {}
+pdf_prerenders_lock = Lock()
+
+def get_pdf_executor():
+    global pdf_executor
+    with pdf_executor_lock:
+        if pdf_executor is None:
+            pdf_executor = ProcessPoolExecutor(max_workers=app.config['PDF_RENDER_WORKERS'], initializer=pdf_worker.init_pdf_worker,
+                                               initargs=(pdf_renderer_settings(),))
+            logging.info(f"تم تشغيل خدمة تحويل PDF بعدد {app.config['PDF_RENDER_WORKERS']} عمليات.")
+        return pdf_executor
+
+def prepare_pdf_data(data, data_type='committee'):
+    """إضافة الحقول المحسوبة التي تظهر في ملف PDF إلى بيانات القرار"""
+    if data_type == 'committee':
+        people = [
+            (role, {"title": title, "name": data[f'{role}_name'], "national_id": data[f'{role}_national_id'], "phone": data[f'{role}_phone']})
+            for role, title in COMMITTEE_ROLES
         ]
+        members = [person for role, person in people if role not in SECRETARIAT_ROLES]
+        secretaries = [person for role, person in people if role in SECRETARIAT_ROLES]
 
         data['members'] = members
         data['secretaries'] = secretaries
-        data['current_date'] = datetime.now().strftime('%Y-%m-%d')
-        data['governorate'] = session.get('governorate', 'غير محدد')
 
-        html_content = render_template('pdf_template.html', committee_data=data)
+    data['current_date'] = datetime.now().strftime('%Y-%m-%d')
+    data['governorate'] = session.get('governorate', 'غير محدد')
+    return data
+
+def build_pdf_html(data=None, data_type='committee'):
+    """تجهيز بيانات القرار وتحويل القالب المناسب إلى HTML"""
+    if not data:
+        return "<html><body><p style='text-align: right; font-family: DejaVu Sans, Arial, sans-serif;'>لا توجد بيانات متاحة</p></body></html>"
 
+    prepare_pdf_data(data, data_type)
+    if data_type == 'committee':
+        return render_template('pdf_template.html', committee_data=data)
     elif data_type == 'appointment':
-        data['current_date'] = datetime.now().strftime('%Y-%m-%d')
-        data['governorate'] = session.get('governorate', 'غير محدد')
-        html_content = render_template('appointment_pdf_template.html', appointment_data=data)
+        return render_template('appointment_pdf_template.html', appointment_data=data)
+
+def start_pdf_render(data=None, data_type='committee', cache_key=None, prerender=False):
+    """بدء تحويل ملف PDF وإرجاع Future بالنتيجة (bytes)"""
+    html_content = build_pdf_html(data, data_type)
+    render_type = data_type if data else None
+
+    key = None
+    if data and cache_key:
+        key = pdf_cache.make_key(data_type, cache_key[0], cache_key[1], data)
+        cached_pdf = pdf_cache.get(key)
+        if cached_pdf is not None:
+            future = Future()
+            future.set_result(cached_pdf)
+            return future
+
+        # انتظار التحويل المسبق الجاري لنفس القرار، أو التحويل مباشرة إذا لم يكتمل في الوقت المحدد
+        with pdf_prerenders_lock:
+            pending = pdf_prerenders.get(key)
+        if pending is not None and not prerender:
+            try:
+                pdf_bytes = pending.result(timeout=app.config['PDF_PRERENDER_WAIT'])
+            except Exception:
+                logging.info("لم يكتمل التحويل المسبق لملف PDF، سيتم التحويل مباشرة.")
+                return render_pdf_in_process(html_content, render_type, key)
+            future = Future()
+            future.set_result(pdf_bytes)
+            return future
+
+    if app.config['PDF_RENDER_WORKERS'] <= 0:
+        return render_pdf_in_process(html_content, render_type, key)
+
+    future = get_pdf_executor().submit(pdf_worker.render_html_to_pdf, html_content, render_type)
+    if prerender and key:
+        with pdf_prerenders_lock:
+            pdf_prerenders[key] = future
+
+    def on_done(done_future):
+        if prerender and key:
+            with pdf_prerenders_lock:
+                pdf_prerenders.pop(key, None)
+        if done_future.exception() is not None:
+            logging.error(f"خطأ أثناء تحويل HTML إلى PDF: {done_future.exception()}")
+            return
+        record_pdf_size(render_type, len(done_future.result()))
+        if key:
+            pdf_cache.put(key, done_future.result())
+
+    future.add_done_callback(on_done)
+    return future
 
+def render_pdf_in_process(html_content, render_type=None, key=None):
+    """تحويل ملف PDF داخل العملية الحالية دون المرور بخدمة التحويل"""
+    future = Future()
     try:
-        HTML(string=html_content).write_pdf(buffer)
+        pdf_bytes = render_html_to_pdf(html_content, render_type)
     except Exception as e:
         logging.error(f"خطأ أثناء تحويل HTML إلى PDF: {e}")
-        raise
+        future.set_exception(e)
+        return future
+
+    record_pdf_size(render_type, len(pdf_bytes))
+    if key:
+        pdf_cache.put(key, pdf_bytes)
+    future.set_result(pdf_bytes)
+    return future
+
+def prerender_decision_pdf(decision_type, decision):
+    """بدء تحويل ملف PDF للقرار الجديد في الخلفية ليكون جاهزاً عند فتحه"""
+    if app.config['PDF_RENDER_WORKERS'] <= 0:
+        return
+    try:
+        data = committee_to_dict(decision) if decision_type == 'committee' else appointment_to_dict(decision)
+        start_pdf_render(data, decision_type, (decision.user_id, decision.id), prerender=True)
+    except Exception as e:
+        logging.warning(f"تعذر بدء التحويل المسبق لملف PDF للقرار {decision.decision_number}: {e}")
 
-    buffer.seek(0)
-    return buffer
+# دالة لتوليد PDF
+def generate_pdf(data=None, data_type='committee', cache_key=None):
+    """cache_key: (user_id, decision_id) لاستخدام ذاكرة التخزين المؤقت"""
+    future = start_pdf_render(data, data_type, cache_key)
+    return io.BytesIO(future.result(timeout=app.config['PDF_RENDER_TIMEOUT']))
+
+def submit_pdf_job(data=None, data_type='committee', cache_key=None, filename='document.pdf', disposition='inline'):
+    """تسجيل مهمة تحويل PDF غير متزامنة وإرجاع رقمها"""
+    future = start_pdf_render(data, data_type, cache_key)
+    job_id = uuid.uuid4().hex
+    now = time.time()
+
+    with pdf_jobs_lock:
+        # حذف المهام المنتهية القديمة
+        for old_id in [j for j, job in pdf_jobs.items() if job['future'].done() and now - job['created_at'] > app.config['PDF_JOB_TTL']]:
+            del pdf_jobs[old_id]
+
+        pdf_jobs[job_id] = {
+            'future': future,
+            'user_id': session.get('user_id'),
+            'filename': filename,
+            'disposition': disposition,
+            'created_at': now
+        }
+    return job_id
+
+def get_pdf_job(job_id):
+    with pdf_jobs_lock:
+        job = pdf_jobs.get(job_id)
+    if job is None or job['user_id'] != session.get('user_id'):
+        return None
+    return job
+
+def pdf_job_state(job):
+    future = job['future']
+    if not future.done():
+        return 'pending'
+    return 'failed' if future.exception() is not None else 'done'
+
+# جلسات المستخدمين على الخادم: ملف تعريف الارتباط يحمل معرف الجلسة الموقع فقط
+class ServerSession(db.Model):
+    __tablename__ = 'sessions'
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class ServerSideSession(SecureCookieSession):
+    """بيانات الجلسة مع معرفها وتاريخ انتهائها المحفوظ في قاعدة البيانات"""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        super().__init__(initial)
+        self.new = sid is None
+        self.sid = sid or secrets.token_urlsafe(32)
+        self.expires_at = expires_at
+        self.previous_sid = None
+
+    def regenerate(self):
+        # معرف جديد عند تسجيل الدخول حتى لا يمكن استخدام معرف تم زرعه قبل الدخول
+        if not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+class DatabaseSessionInterface(SessionInterface):
+    """حفظ الجلسات في جدول sessions وكتابتها فقط عند تعديلها أو عند اقتراب انتهائها"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self):
+        self.last_sweep = time.monotonic()
+        self._lock = Lock()
+
+    def get_signer(self, app):
+        return Signer(app.secret_key, salt='server-session')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return ServerSideSession()
+        try:
+            sid = self.get_signer(app).unsign(cookie).decode('ascii')
+        except BadSignature:
+            return ServerSideSession()
+
+        table = ServerSession.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                db.select(table.c.data, table.c.expires_at).where(table.c.id == sid, table.c.expires_at > datetime.utcnow())
+            ).first()
+        if row is None:
+            return ServerSideSession()
+        return ServerSideSession(self.serializer.loads(row.data), sid, row.expires_at)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        table = ServerSession.__table__
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        # جلسة لا تحتوي إلا على علامة permanent لا تحفظ حتى لا يتم إنشاء صف لكل زائر
+        if not any(key != '_permanent' for key in session):
+            if not session.new and session.modified:
+                with db.engine.begin() as conn:
+                    conn.execute(table.delete().where(table.c.id.in_([session.sid, session.previous_sid])))
+                response.delete_cookie(name, domain=domain, path=path, secure=self.get_cookie_secure(app),
+                                       httponly=self.get_cookie_httponly(app), samesite=self.get_cookie_samesite(app))
+            return
+
+        now = datetime.utcnow()
+        lifetime = app.permanent_session_lifetime
+        # تمديد الجلسة غير المعدلة مرة كل SESSION_REFRESH_INTERVAL ثانية على الأكثر بدلاً من كل طلب
+        refresh = session.expires_at is None or session.expires_at - now < lifetime - timedelta(seconds=app.config['SESSION_REFRESH_INTERVAL'])
+        if not (session.new or session.modified or refresh):
+            return
+
+        data = self.serializer.dumps(dict(session))
+        expires_at = now + lifetime
+        with db.engine.begin() as conn:
+            if session.previous_sid:
+                conn.execute(table.delete().where(table.c.id == session.previous_sid))
+            if not conn.execute(table.update().where(table.c.id == session.sid).values(data=data, expires_at=expires_at)).rowcount:
+                conn.execute(table.insert().values(id=session.sid, data=data, expires_at=expires_at))
+
+        response.set_cookie(
+            name,
+            self.get_signer(app).sign(session.sid.encode('ascii')).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        self.maybe_sweep(app)
+
+    def maybe_sweep(self, app):
+        with self._lock:
+            if time.monotonic() - self.last_sweep < app.config['SESSION_SWEEP_INTERVAL']:
+                return
+            self.last_sweep = time.monotonic()
+        try:
+            sweep_expired_sessions()
+        except SQLAlchemyError as e:
+            logging.warning(f"تعذر حذف الجلسات المنتهية: {e}")
+
+def sweep_expired_sessions():
+    """حذف الجلسات المنتهية وإرجاع عددها"""
+    table = ServerSession.__table__
+    with db.engine.begin() as conn:
+        deleted = conn.execute(table.delete().where(table.c.expires_at <= datetime.utcnow())).rowcount
+    if deleted:
+        logging.info(f"تم حذف {deleted} جلسة منتهية.")
+    return deleted
+
+app.session_interface = DatabaseSessionInterface()
 
 @app.before_request
 def make_session_permanent():
-    session.permanent = True
+    # التعيين فقط عند الحاجة حتى لا تعتبر الجلسة معدلة في كل طلب
+    if not session.permanent:
+        session.permanent = True
+
+@app.before_request
+def start_request_timer():
+    g.request_start_time = time.perf_counter()
+
+@app.after_request
+def add_query_timing(response):
+    """إضافة عدد الاستعلامات وزمنها إلى ترويسة Server-Timing وإلى إحصائيات المسار"""
+    if request.endpoint == 'static' or 'request_start_time' not in g:
+        return response
+
+    # زمن الاستعلامات التي تنفذ أثناء إرسال الاستجابات المتدفقة لا يدخل في هذه القيم
+    query_count = g.get('sql_query_count', 0)
+    db_seconds = g.get('sql_query_time', 0.0)
+    total_seconds = time.perf_counter() - g.request_start_time
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={db_seconds * 1000:.2f};desc="{query_count} queries", total;dur={total_seconds * 1000:.2f}'
+    )
+    route_query_stats.record(request.endpoint or 'unknown', query_count, db_seconds, total_seconds)
+    return response
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# مرشح Bloom لكلمات المرور الشائعة: فحص بزمن ثابت دون الرجوع إلى جدول المستخدمين
+class BloomFilter:
+    """مجموعة احتمالية مضغوطة: لا تعطي نتيجة سلبية خاطئة، والإيجابية الخاطئة بنسبة محددة"""
+
+    MAGIC = b'BLM1'
+    HEADER = struct.Struct('>4sIB32s')  # المعرف، عدد البتات، عدد دوال التجزئة، بصمة القائمة المصدر
+
+    def __init__(self, size, hash_count, source_digest=b'\0' * 32, bits=None):
+        self.size = size
+        self.hash_count = hash_count
+        self.source_digest = source_digest
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate, source_digest=b'\0' * 32):
+        size = max(8, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        hash_count = max(1, round(size / max(capacity, 1) * math.log(2)))
+        return cls(size, hash_count, source_digest)
+
+    def _positions(self, item):
+        # تجزئة مزدوجة: k موضع من بصمة SHA-256 واحدة
+        digest = hashlib.sha256(item.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def to_bytes(self):
+        return self.HEADER.pack(self.MAGIC, self.size, self.hash_count, self.source_digest) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, size, hash_count, source_digest = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('ملف مرشح Bloom غير صالح')
+        return cls(size, hash_count, source_digest, bytearray(data[cls.HEADER.size:]))
+
+def normalize_password(password):
+    return password.strip().lower()
+
+def read_password_list(path):
+    """قراءة قائمة كلمات المرور (سطر لكل كلمة، مع تجاهل التعليقات) وبصمة محتواها"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    passwords = {
+        normalize_password(line) for line in content.decode('utf-8').splitlines()
+        if line.strip() and not line.startswith('#')
+    }
+    return passwords, hashlib.sha256(content).digest()
+
+def build_password_filter(list_path, false_positive_rate):
+    passwords, digest = read_password_list(list_path)
+    bloom = BloomFilter.for_capacity(len(passwords), false_positive_rate, digest)
+    for password in passwords:
+        bloom.add(password)
+    return bloom, len(passwords)
+
+password_filter = None
+password_filter_lock = Lock()
+
+def get_password_filter():
+    """تحميل المرشح المبني مسبقاً مرة واحدة لكل عملية، أو بناؤه من القائمة إذا كان غير موجود أو قديماً"""
+    global password_filter
+    with password_filter_lock:
+        if password_filter is not None:
+            return password_filter
+
+        list_path = app.config['PASSWORD_BLOCKLIST_FILE']
+        filter_path = app.config['PASSWORD_FILTER_FILE']
+        try:
+            with open(filter_path, 'rb') as f:
+                bloom = BloomFilter.from_bytes(f.read())
+            with open(list_path, 'rb') as f:
+                if hashlib.sha256(f.read()).digest() != bloom.source_digest:
+                    logging.warning("مرشح كلمات المرور أقدم من القائمة المصدر، يرجى تشغيل flask build-password-filter")
+                    bloom = None
+        except FileNotFoundError:
+            bloom = None
+        except (OSError, ValueError, struct.error) as e:
+            logging.warning(f"تعذر تحميل مرشح كلمات المرور: {e}")
+            bloom = None
+
+        if bloom is None:
+            bloom, _ = build_password_filter(list_path, app.config['PASSWORD_FILTER_FALSE_POSITIVE_RATE'])
+        password_filter = bloom
+        return password_filter
+
+def is_common_password(password):
+    return normalize_password(password) in get_password_filter()
+
 @app.route('/signup', methods=['POST'])
 def signup():
     if request.method == 'POST':
@@ -382,12 +1576,10 @@ def signup():
             logging.warning(f"البريد الإلكتروني {email} مستخدم بالفعل.")
             return redirect(url_for('index'))
 
-        all_users = User.query.all()
-        for user in all_users:
-            if user.check_password(password):
-                flash('كلمة المرور مستخدمة بالفعل، اختر كلمة مرور أخرى.', 'error')
-                logging.warning(f"كلمة المرور مستخدمة بالفعل بواسطة مستخدم آخر.")
-                return redirect(url_for('index'))
+        if is_common_password(password):
+            flash('كلمة المرور شائعة وسهلة التخمين، اختر كلمة مرور أخرى.', 'error')
+            logging.warning("تم رفض كلمة مرور شائعة أثناء التسجيل.")
+            return redirect(url_for('index'))
 
         try:
             new_user = User(
@@ -429,8 +1621,13 @@ def login():
             logging.info(f"المستخدم {full_name} حاول تسجيل الدخول لكنه غير مفعل.")
             return redirect(url_for('index'))
 
+        if user.password_needs_rehash():
+            password_rehash_executor.submit(rehash_password, user.id, user.password_hash, password)
+
+        session.regenerate()
         session['user_id'] = user.id
         session['roles'] = user.roles
+        session['permissions'] = permissions_for_roles(user.roles)
         session['full_name'] = user.full_name
         session['governorate'] = user.governorate
         flash('تم تسجيل الدخول بنجاح!', 'success')
@@ -455,17 +1652,8 @@ def profile():
     return render_template('profile.html', full_name=session['full_name'], roles=session['roles'])
 
 @app.route('/activate_user/<int:user_id>', methods=['GET', 'POST'])
+@require_permissions(Permission.MANAGE_USERS, 'ليس لديك صلاحية لتفعيل المستخدمين.', redirect_endpoint='dashboard')
 def activate_user(user_id):
-    if 'user_id' not in session:
-        flash('يرجى تسجيل الدخول أولاً', 'error')
-        return redirect(url_for('index'))
-
-    allowed_roles = ['"governor"', '"general_admin"']
-    user_roles = session['roles']
-    if not any(role in user_roles for role in allowed_roles):
-        flash('ليس لديك صلاحية لتفعيل المستخدمين.', 'error')
-        return redirect(url_for('dashboard'))
-
     user = db.session.get(User, user_id)
     if not user:
         flash('المستخدم غير موجود.', 'error')
@@ -487,130 +1675,132 @@ def activate_user(user_id):
     return render_template('activate_user.html', user=user)
 
 @app.route('/pending_users')
+@require_permissions(Permission.MANAGE_USERS, 'ليس لديك صلاحية لعرض المستخدمين المنتظرين.', redirect_endpoint='dashboard')
 def pending_users():
-    if 'user_id' not in session:
-        flash('يرجى تسجيل الدخول أولاً', 'error')
-        return redirect(url_for('index'))
-
-    allowed_roles = ['"governor"', '"general_admin"']
-    user_roles = session['roles']
-    if not any(role in user_roles for role in allowed_roles):
-        flash('ليس لديك صلاحية لعرض المستخدمين المنتظرين.', 'error')
-        return redirect(url_for('dashboard'))
-
-    pending_users = User.query.filter_by(active=False).all()
-    return render_template('pending_users.html', pending_users=pending_users)
+    pending_users, next_cursor = keyset_page(User.query.filter_by(active=False), User.created_at, User.id)
+    return render_template('pending_users.html', pending_users=pending_users, next_cursor=next_cursor)
 
 @app.route('/logout')
 def logout():
     session.pop('user_id', None)
     session.pop('roles', None)
+    session.pop('permissions', None)
     session.pop('full_name', None)
     session.pop('governorate', None)
     flash('تم تسجيل الخروج بنجاح!', 'success')
     return redirect(url_for('index'))
 
+# تحويل قرار تعيين إلى قاموس بيانات
+def appointment_to_dict(appointment):
+    return {
+        'decision_number': appointment.decision_number,
+        'decision_date': appointment.decision_date.strftime('%Y-%m-%d'),
+        'governorate': appointment.governorate,
+        'announcement_number': appointment.announcement_number,
+        'candidate_code': appointment.candidate_code,
+        'article_one_text': appointment.article_one_text,
+        'article_two_text': appointment.article_two_text,
+        'article_three_text': appointment.article_three_text,
+        'competent_authority': appointment.competent_authority,
+        'authority_approval': appointment.authority_approval,
+        'files': {
+            'announcement_file': appointment.announcement_file,
+            'candidate_file': appointment.candidate_file,
+            'decision_file': appointment.decision_file
+        },
+        'type': 'appointment'
+    }
+
+# تحويل قرار لجنة إلى قاموس بيانات (بنفس الشكل المسطح الذي تستخدمه القوالب)
+def committee_to_dict(committee):
+    data = {
+        'decision_number': committee.decision_number,
+        'decision_date': committee.decision_date.strftime('%Y-%m-%d'),
+        'governorate': committee.governorate,
+        'preamble': committee.preamble,
+        'article_one_text': committee.article_one_text,
+        'article_two_text': committee.article_two_text,
+        'committee_tasks': committee.committee_tasks,
+        'article_four': committee.article_four,
+        'competent_authority': committee.competent_authority,
+        'authority_approval': committee.authority_approval
+    }
+    for member in committee.members:
+        data[f'{member.role}_name'] = member.name
+        data[f'{member.role}_national_id'] = member.national_id
+        data[f'{member.role}_phone'] = member.phone
+    return data
+
+# جلب آخر قرار تم إنشاؤه للمستخدم الحالي حسب نوع القرار
+def get_latest_decision(decision_type):
+    if decision_type == 'appointment':
+        query = AppointmentDecision.query
+        model = AppointmentDecision
+    elif decision_type == 'committee':
+        query = LeadershipCommittee.query.options(selectinload(LeadershipCommittee.members))
+        model = LeadershipCommittee
+    else:
+        return None
+    return query.filter_by(status='created', user_id=session['user_id']).order_by(model.created_at.desc()).first()
+
+# إنشاء استجابة PDF لآخر قرار (مع استخدام ذاكرة التخزين المؤقت)
+def pdf_download_name(prefix, decision_number):
+    """اسم ملف التحميل: أرقام القرارات قد تحتوي على / مثل 7/2025"""
+    number = re.sub(r'[\\/]+', '-', str(decision_number))
+    return f"{prefix}_{number}.pdf"
+
+def decision_pdf_response(decision_type, disposition):
+    decision = get_latest_decision(decision_type)
+
+    if decision is None:
+        data, cache_key = None, None
+        filename = 'no_data.pdf'
+    elif decision_type == 'appointment':
+        data, cache_key = appointment_to_dict(decision), (decision.user_id, decision.id)
+        filename = pdf_download_name('appointment', decision.decision_number)
+    else:
+        data, cache_key = committee_to_dict(decision), (decision.user_id, decision.id)
+        filename = pdf_download_name('decision', decision.decision_number)
+
+    # الوضع غير المتزامن: إرجاع رقم المهمة لمتابعتها بدلاً من انتظار التحويل
+    if request.args.get('async') == '1':
+        job_id = submit_pdf_job(data, decision_type, cache_key, filename, disposition)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': url_for('pdf_job_status', job_id=job_id),
+            'result_url': url_for('pdf_job_result', job_id=job_id)
+        }), 202
+
+    etag = None
+    if decision is not None:
+        # ETag مشتق من بصمة بيانات القرار وإصدار القوالب وملفات الأنماط (pdf_cache.version)، يتيح الرد بـ 304 دون إعادة التحويل
+        # ويتغير بعد تعديل القوالب حتى لا يحتفظ المتصفح بملف لا يطابق التحويل الحالي
+        etag = pdf_cache.make_key(decision_type, decision.user_id, decision.id, prepare_pdf_data(dict(data), decision_type))
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+            response.set_etag(etag)
+            response.last_modified = decision.created_at
+            return response
+
+    pdf_buffer = generate_pdf(data, data_type=decision_type, cache_key=cache_key)
+    response = send_file(
+        pdf_buffer,
+        mimetype='application/pdf',
+        as_attachment=(disposition == 'attachment'),
+        download_name=filename,
+        etag=etag if etag else False,
+        last_modified=decision.created_at if decision is not None else None,
+        conditional=True
+    )
+    response.headers['X-PDF-Size'] = str(pdf_buffer.getbuffer().nbytes)
+    return response
+
 @app.route('/view_pdf')
 def view_pdf():
     try:
         decision_type = request.args.get('type', 'committee')  # جلب نوع القرار من المعلمة
-
-        if decision_type == 'appointment':
-            latest_appointment = AppointmentDecision.query.filter_by(status='created', user_id=session['user_id']).order_by(AppointmentDecision.created_at.desc()).first()
-            if latest_appointment:
-                appointment_data = {
-                    'decision_number': latest_appointment.decision_number,
-                    'decision_date': latest_appointment.decision_date.strftime('%Y-%m-%d'),
-                    'governorate': latest_appointment.governorate,
-                    'announcement_number': latest_appointment.announcement_number,
-                    'candidate_code': latest_appointment.candidate_code,
-                    'article_one_text': latest_appointment.article_one_text,
-                    'article_two_text': latest_appointment.article_two_text,
-                    'article_three_text': latest_appointment.article_three_text,
-                    'competent_authority': latest_appointment.competent_authority,
-                    'authority_approval': latest_appointment.authority_approval,
-                    'files': {
-                        'announcement_file': latest_appointment.announcement_file,
-                        'candidate_file': latest_appointment.candidate_file,
-                        'decision_file': latest_appointment.decision_file
-                    },
-                    'type': 'appointment'
-                }
-                pdf_buffer = generate_pdf(appointment_data, data_type='appointment')
-                response = make_response(pdf_buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'inline; filename=appointment_{latest_appointment.decision_number}.pdf'
-                return response
-            else:
-                pdf_buffer = generate_pdf()
-                response = make_response(pdf_buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = 'inline; filename=no_data.pdf'
-                return response
-
-        elif decision_type == 'committee':
-            latest_committee = LeadershipCommittee.query.filter_by(status='created', user_id=session['user_id']).order_by(LeadershipCommittee.created_at.desc()).first()
-            if latest_committee:
-                committee_data = {
-                    'decision_number': latest_committee.decision_number,
-                    'decision_date': latest_committee.decision_date.strftime('%Y-%m-%d'),
-                    'governorate': latest_committee.governorate,
-                    'preamble': latest_committee.preamble,
-                    'article_one_text': latest_committee.article_one_text,
-                    'chairperson_name': latest_committee.chairperson_name,
-                    'chairperson_national_id': latest_committee.chairperson_national_id,
-                    'chairperson_phone': latest_committee.chairperson_phone,
-                    'admin_member_name': latest_committee.admin_member_name,
-                    'admin_member_national_id': latest_committee.admin_member_national_id,
-                    'admin_member_phone': latest_committee.admin_member_phone,
-                    'hr_member_name': latest_committee.hr_member_name,
-                    'hr_member_national_id': latest_committee.hr_member_national_id,
-                    'hr_member_phone': latest_committee.hr_member_phone,
-                    'it_member_name': latest_committee.it_member_name,
-                    'it_member_national_id': latest_committee.it_member_national_id,
-                    'it_member_phone': latest_committee.it_member_phone,
-                    'legal_member_name': latest_committee.legal_member_name,
-                    'legal_member_national_id': latest_committee.legal_member_national_id,
-                    'legal_member_phone': latest_committee.legal_member_phone,
-                    'other_member_1_name': latest_committee.other_member_1_name,
-                    'other_member_1_national_id': latest_committee.other_member_1_national_id,
-                    'other_member_1_phone': latest_committee.other_member_1_phone,
-                    'other_member_2_name': latest_committee.other_member_2_name,
-                    'other_member_2_national_id': latest_committee.other_member_2_national_id,
-                    'other_member_2_phone': latest_committee.other_member_2_phone,
-                    'article_two_text': latest_committee.article_two_text,
-                    'secretary_name': latest_committee.secretary_name,
-                    'secretary_national_id': latest_committee.secretary_national_id,
-                    'secretary_phone': latest_committee.secretary_phone,
-                    'secretary_member_1_name': latest_committee.secretary_member_1_name,
-                    'secretary_member_1_national_id': latest_committee.secretary_member_1_national_id,
-                    'secretary_member_1_phone': latest_committee.secretary_member_1_phone,
-                    'secretary_member_2_name': latest_committee.secretary_member_2_name,
-                    'secretary_member_2_national_id': latest_committee.secretary_member_2_national_id,
-                    'secretary_member_2_phone': latest_committee.secretary_member_2_phone,
-                    'committee_tasks': latest_committee.committee_tasks,
-                    'article_four': latest_committee.article_four,
-                    'competent_authority': latest_committee.competent_authority,
-                    'authority_approval': latest_committee.authority_approval
-                }
-                pdf_buffer = generate_pdf(committee_data, data_type='committee')
-                response = make_response(pdf_buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'inline; filename=decision_{latest_committee.decision_number}.pdf'
-                return response
-            else:
-                pdf_buffer = generate_pdf()
-                response = make_response(pdf_buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = 'inline; filename=no_data.pdf'
-                return response
-
-        else:
-            pdf_buffer = generate_pdf()
-            response = make_response(pdf_buffer.getvalue())
-            response.headers['Content-Type'] = 'application/pdf'
-            response.headers['Content-Disposition'] = 'inline; filename=no_data.pdf'
-            return response
+        return decision_pdf_response(decision_type, 'inline')
     except Exception as e:
         logging.error(f"خطأ أثناء إنشاء ملف PDF للعرض: {e}")
         flash('حدث خطأ أثناء إنشاء ملف PDF، حاول مرة أخرى.', 'error')
@@ -620,90 +1810,7 @@ def view_pdf():
 def print_pdf():
     try:
         decision_type = request.args.get('type', 'committee')
-
-        if decision_type == 'appointment':
-            latest_appointment = AppointmentDecision.query.filter_by(status='created', user_id=session['user_id']).order_by(AppointmentDecision.created_at.desc()).first()
-            if latest_appointment:
-                appointment_data = {
-                    'decision_number': latest_appointment.decision_number,
-                    'decision_date': latest_appointment.decision_date.strftime('%Y-%m-%d'),
-                    'governorate': latest_appointment.governorate,
-                    'announcement_number': latest_appointment.announcement_number,
-                    'candidate_code': latest_appointment.candidate_code,
-                    'article_one_text': latest_appointment.article_one_text,
-                    'article_two_text': latest_appointment.article_two_text,
-                    'article_three_text': latest_appointment.article_three_text,
-                    'competent_authority': latest_appointment.competent_authority,
-                    'authority_approval': latest_appointment.authority_approval,
-                    'files': {
-                        'announcement_file': latest_appointment.announcement_file,
-                        'candidate_file': latest_appointment.candidate_file,
-                        'decision_file': latest_appointment.decision_file
-                    },
-                    'type': 'appointment'
-                }
-                pdf_buffer = generate_pdf(appointment_data, data_type='appointment')
-                response = make_response(pdf_buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'inline; filename=appointment_{latest_appointment.decision_number}.pdf'
-                return response
-
-        elif decision_type == 'committee':
-            latest_committee = LeadershipCommittee.query.filter_by(status='created', user_id=session['user_id']).order_by(LeadershipCommittee.created_at.desc()).first()
-            if latest_committee:
-                committee_data = {
-                    'decision_number': latest_committee.decision_number,
-                    'decision_date': latest_committee.decision_date.strftime('%Y-%m-%d'),
-                    'governorate': latest_committee.governorate,
-                    'preamble': latest_committee.preamble,
-                    'article_one_text': latest_committee.article_one_text,
-                    'chairperson_name': latest_committee.chairperson_name,
-                    'chairperson_national_id': latest_committee.chairperson_national_id,
-                    'chairperson_phone': latest_committee.chairperson_phone,
-                    'admin_member_name': latest_committee.admin_member_name,
-                    'admin_member_national_id': latest_committee.admin_member_national_id,
-                    'admin_member_phone': latest_committee.admin_member_phone,
-                    'hr_member_name': latest_committee.hr_member_name,
-                    'hr_member_national_id': latest_committee.hr_member_national_id,
-                    'hr_member_phone': latest_committee.hr_member_phone,
-                    'it_member_name': latest_committee.it_member_name,
-                    'it_member_national_id': latest_committee.it_member_national_id,
-                    'it_member_phone': latest_committee.it_member_phone,
-                    'legal_member_name': latest_committee.legal_member_name,
-                    'legal_member_national_id': latest_committee.legal_member_national_id,
-                    'legal_member_phone': latest_committee.legal_member_phone,
-                    'other_member_1_name': latest_committee.other_member_1_name,
-                    'other_member_1_national_id': latest_committee.other_member_1_national_id,
-                    'other_member_1_phone': latest_committee.other_member_1_phone,
-                    'other_member_2_name': latest_committee.other_member_2_name,
-                    'other_member_2_national_id': latest_committee.other_member_2_national_id,
-                    'other_member_2_phone': latest_committee.other_member_2_phone,
-                    'article_two_text': latest_committee.article_two_text,
-                    'secretary_name': latest_committee.secretary_name,
-                    'secretary_national_id': latest_committee.secretary_national_id,
-                    'secretary_phone': latest_committee.secretary_phone,
-                    'secretary_member_1_name': latest_committee.secretary_member_1_name,
-                    'secretary_member_1_national_id': latest_committee.secretary_member_1_national_id,
-                    'secretary_member_1_phone': latest_committee.secretary_member_1_phone,
-                    'secretary_member_2_name': latest_committee.secretary_member_2_name,
-                    'secretary_member_2_national_id': latest_committee.secretary_member_2_national_id,
-                    'secretary_member_2_phone': latest_committee.secretary_member_2_phone,
-                    'committee_tasks': latest_committee.committee_tasks,
-                    'article_four': latest_committee.article_four,
-                    'competent_authority': latest_committee.competent_authority,
-                    'authority_approval': latest_committee.authority_approval
-                }
-                pdf_buffer = generate_pdf(committee_data, data_type='committee')
-                response = make_response(pdf_buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'inline; filename=decision_{latest_committee.decision_number}.pdf'
-                return response
-
-        pdf_buffer = generate_pdf()
-        response = make_response(pdf_buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = 'inline; filename=no_data.pdf'
-        return response
+        return decision_pdf_response(decision_type, 'inline')
     except Exception as e:
         logging.error(f"خطأ أثناء إنشاء ملف PDF للطباعة: {e}")
         flash('حدث خطأ أثناء إنشاء ملف PDF للطباعة، حاول مرة أخرى.', 'error')
@@ -713,95 +1820,258 @@ def print_pdf():
 def download_pdf():
     try:
         decision_type = request.args.get('type', 'committee')
-
-        if decision_type == 'appointment':
-            latest_appointment = AppointmentDecision.query.filter_by(status='created', user_id=session['user_id']).order_by(AppointmentDecision.created_at.desc()).first()
-            if latest_appointment:
-                appointment_data = {
-                    'decision_number': latest_appointment.decision_number,
-                    'decision_date': latest_appointment.decision_date.strftime('%Y-%m-%d'),
-                    'governorate': latest_appointment.governorate,
-                    'announcement_number': latest_appointment.announcement_number,
-                    'candidate_code': latest_appointment.candidate_code,
-                    'article_one_text': latest_appointment.article_one_text,
-                    'article_two_text': latest_appointment.article_two_text,
-                    'article_three_text': latest_appointment.article_three_text,
-                    'competent_authority': latest_appointment.competent_authority,
-                    'authority_approval': latest_appointment.authority_approval,
-                    'files': {
-                        'announcement_file': latest_appointment.announcement_file,
-                        'candidate_file': latest_appointment.candidate_file,
-                        'decision_file': latest_appointment.decision_file
-                    },
-                    'type': 'appointment'
-                }
-                pdf_buffer = generate_pdf(appointment_data, data_type='appointment')
-                response = make_response(pdf_buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'attachment; filename=appointment_{latest_appointment.decision_number}.pdf'
-                return response
-
-        elif decision_type == 'committee':
-            latest_committee = LeadershipCommittee.query.filter_by(status='created', user_id=session['user_id']).order_by(LeadershipCommittee.created_at.desc()).first()
-            if latest_committee:
-                committee_data = {
-                    'decision_number': latest_committee.decision_number,
-                    'decision_date': latest_committee.decision_date.strftime('%Y-%m-%d'),
-                    'governorate': latest_committee.governorate,
-                    'preamble': latest_committee.preamble,
-                    'article_one_text': latest_committee.article_one_text,
-                    'chairperson_name': latest_committee.chairperson_name,
-                    'chairperson_national_id': latest_committee.chairperson_national_id,
-                    'chairperson_phone': latest_committee.chairperson_phone,
-                    'admin_member_name': latest_committee.admin_member_name,
-                    'admin_member_national_id': latest_committee.admin_member_national_id,
-                    'admin_member_phone': latest_committee.admin_member_phone,
-                    'hr_member_name': latest_committee.hr_member_name,
-                    'hr_member_national_id': latest_committee.hr_member_national_id,
-                    'hr_member_phone': latest_committee.hr_member_phone,
-                    'it_member_name': latest_committee.it_member_name,
-                    'it_member_national_id': latest_committee.it_member_national_id,
-                    'it_member_phone': latest_committee.it_member_phone,
-                    'legal_member_name': latest_committee.legal_member_name,
-                    'legal_member_national_id': latest_committee.legal_member_national_id,
-                    'legal_member_phone': latest_committee.legal_member_phone,
-                    'other_member_1_name': latest_committee.other_member_1_name,
-                    'other_member_1_national_id': latest_committee.other_member_1_national_id,
-                    'other_member_1_phone': latest_committee.other_member_1_phone,
-                    'other_member_2_name': latest_committee.other_member_2_name,
-                    'other_member_2_national_id': latest_committee.other_member_2_national_id,
-                    'other_member_2_phone': latest_committee.other_member_2_phone,
-                    'article_two_text': latest_committee.article_two_text,
-                    'secretary_name': latest_committee.secretary_name,
-                    'secretary_national_id': latest_committee.secretary_national_id,
-                    'secretary_phone': latest_committee.secretary_phone,
-                    'secretary_member_1_name': latest_committee.secretary_member_1_name,
-                    'secretary_member_1_national_id': latest_committee.secretary_member_1_national_id,
-                    'secretary_member_1_phone': latest_committee.secretary_member_1_phone,
-                    'secretary_member_2_name': latest_committee.secretary_member_2_name,
-                    'secretary_member_2_national_id': latest_committee.secretary_member_2_national_id,
-                    'secretary_member_2_phone': latest_committee.secretary_member_2_phone,
-                    'committee_tasks': latest_committee.committee_tasks,
-                    'article_four': latest_committee.article_four,
-                    'competent_authority': latest_committee.competent_authority,
-                    'authority_approval': latest_committee.authority_approval
-                }
-                pdf_buffer = generate_pdf(committee_data, data_type='committee')
-                response = make_response(pdf_buffer.getvalue())
-                response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'attachment; filename=decision_{latest_committee.decision_number}.pdf'
-                return response
-
-        pdf_buffer = generate_pdf()
-        response = make_response(pdf_buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = 'attachment; filename=no_data.pdf'
-        return response
+        return decision_pdf_response(decision_type, 'attachment')
     except Exception as e:
         logging.error(f"خطأ أثناء إنشاء ملف PDF للتحميل: {e}")
         flash('حدث خطأ أثناء تحميل ملف PDF، حاول مرة أخرى.', 'error')
         return redirect(url_for('form_leadership_committee'))
 
+@app.route('/pdf_cache_stats')
+@require_permissions(Permission.VIEW_SYSTEM_STATS, 'ليس لديك صلاحية لعرض إحصائيات ملفات PDF')
+def pdf_cache_stats():
+    return jsonify({
+        'success': True,
+        'data': pdf_cache.stats(),
+        'sizes': get_pdf_size_stats()
+    })
+
+@app.route('/cache_stats')
+@require_permissions(Permission.VIEW_SYSTEM_STATS, 'ليس لديك صلاحية لعرض إحصائيات ذاكرة التخزين المؤقت')
+def cache_stats():
+    return jsonify({
+        'success': True,
+        'data': cache.stats()
+    })
+
+@app.route('/pdf_jobs/<job_id>')
+def pdf_job_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
+
+    job = get_pdf_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'المهمة غير موجودة'}), 404
+
+    # إمكانية الانتظار حتى انتهاء التحويل لمدة محددة بالثواني
+    wait = min(request.args.get('wait', 0, type=float), app.config['PDF_RENDER_TIMEOUT'])
+    if wait > 0:
+        try:
+            job['future'].result(timeout=wait)
+        except Exception:
+            pass
+
+    status = pdf_job_state(job)
+    return jsonify({
+        'success': status != 'failed',
+        'job_id': job_id,
+        'status': status,
+        'result_url': url_for('pdf_job_result', job_id=job_id) if status == 'done' else None
+    })
+
+@app.route('/pdf_jobs/<job_id>/result')
+def pdf_job_result(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
+
+    job = get_pdf_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'المهمة غير موجودة'}), 404
+
+    status = pdf_job_state(job)
+    if status == 'pending':
+        return jsonify({'success': True, 'job_id': job_id, 'status': status}), 202
+    if status == 'failed':
+        return jsonify({'success': False, 'message': 'حدث خطأ أثناء إنشاء ملف PDF'}), 500
+
+    pdf_bytes = job['future'].result()
+    response = send_file(
+        io.BytesIO(pdf_bytes),
+        mimetype='application/pdf',
+        as_attachment=(job['disposition'] == 'attachment'),
+        download_name=job['filename']
+    )
+    response.headers['X-PDF-Size'] = str(len(pdf_bytes))
+    return response
+
+# التصدير المجمع للقرارات في ملف PDF واحد أو ملف ZIP
+bulk_export_jobs = {}
+bulk_export_jobs_lock = Lock()
+# دمج الملفات في PDF واحد يحتاج مكتبة pypdf الاختيارية، والتصدير بصيغة ZIP لا يحتاجها
+PDF_MERGE_AVAILABLE = importlib.util.find_spec('pypdf') is not None
+
+def merge_pdf_files(pdf_files, output_path):
+    """دمج عدة ملفات PDF في ملف واحد"""
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for pdf_bytes in pdf_files:
+        writer.append(PdfReader(io.BytesIO(pdf_bytes)))
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+
+def run_bulk_export(job):
+    """تجميع نتائج التحويل المتوازي في ملف التصدير (تعمل في خلفية التطبيق)"""
+    try:
+        if job['format'] == 'zip':
+            with zipfile.ZipFile(job['path'], 'w', zipfile.ZIP_DEFLATED) as archive:
+                for filename, future in job['items']:
+                    archive.writestr(filename, future.result(timeout=app.config['PDF_RENDER_TIMEOUT']))
+                    job['completed'] += 1
+        else:
+            pdf_files = []
+            for filename, future in job['items']:
+                pdf_files.append(future.result(timeout=app.config['PDF_RENDER_TIMEOUT']))
+                job['completed'] += 1
+            job['status'] = 'merging'
+            merge_pdf_files(pdf_files, job['path'])
+
+        job['status'] = 'done'
+        logging.info(f"تم الانتهاء من التصدير المجمع لعدد {job['total']} قرار.")
+    except Exception as e:
+        job['status'] = 'failed'
+        logging.error(f"خطأ أثناء التصدير المجمع للقرارات: {e}")
+    finally:
+        job['items'] = []
+        job['finished_at'] = time.time()
+
+def prune_bulk_export_jobs():
+    now = time.time()
+    with bulk_export_jobs_lock:
+        for job_id in [j for j, job in bulk_export_jobs.items()
+                       if job['finished_at'] and now - job['finished_at'] > app.config['PDF_JOB_TTL']]:
+            job = bulk_export_jobs.pop(job_id)
+            try:
+                os.remove(job['path'])
+            except OSError:
+                pass
+
+@app.route('/bulk_export_decisions', methods=['POST'])
+def bulk_export_decisions():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
+
+    decision_type = request.form.get('decision_type', 'all')
+    status = request.form.get('status', 'created')
+    export_format = request.form.get('format', 'pdf')
+    selected = request.form.getlist('decisions')  # بصيغة type:id
+
+    if decision_type not in ['committee', 'appointment', 'all'] or export_format not in ['pdf', 'zip']:
+        return jsonify({'success': False, 'message': 'بيانات التصدير غير صالحة'})
+    if export_format == 'pdf' and not PDF_MERGE_AVAILABLE:
+        return jsonify({'success': False, 'message': 'التصدير في ملف PDF واحد غير متاح لأن مكتبة pypdf غير مثبتة، يمكنك التصدير بصيغة ZIP'}), 400
+
+    try:
+        start_date = request.form.get('start_date')
+        end_date = request.form.get('end_date')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+        end_date = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) if end_date else None
+
+        selected_ids = {}
+        for item in selected:
+            item_type, _, item_id = item.partition(':')
+            selected_ids.setdefault(item_type, set()).add(int(item_id))
+
+        decisions = []
+        for item_type, model in [('committee', LeadershipCommittee), ('appointment', AppointmentDecision)]:
+            if decision_type not in [item_type, 'all']:
+                continue
+            query = model.query.filter_by(user_id=session['user_id'], status=status)
+            if model is LeadershipCommittee:
+                query = query.options(selectinload(LeadershipCommittee.members))
+            if selected:
+                query = query.filter(model.id.in_(selected_ids.get(item_type, set())))
+            if start_date:
+                query = query.filter(model.created_at >= start_date)
+            if end_date:
+                query = query.filter(model.created_at < end_date)
+            decisions.extend((item_type, decision) for decision in query.order_by(model.created_at).all())
+
+        if not decisions:
+            return jsonify({'success': False, 'message': 'لا توجد قرارات مطابقة للتصدير'})
+        if len(decisions) > app.config['BULK_EXPORT_MAX_DECISIONS']:
+            return jsonify({'success': False, 'message': f"الحد الأقصى للتصدير المجمع هو {app.config['BULK_EXPORT_MAX_DECISIONS']} قرار"})
+
+        # بدء التحويل المتوازي لجميع القرارات في عمليات خدمة التحويل
+        items = []
+        for index, (item_type, decision) in enumerate(decisions, start=1):
+            data = committee_to_dict(decision) if item_type == 'committee' else appointment_to_dict(decision)
+            future = start_pdf_render(data, item_type, (decision.user_id, decision.id))
+            items.append((f"{index:03d}_{item_type}_{secure_filename(decision.decision_number) or decision.id}.pdf", future))
+
+        prune_bulk_export_jobs()
+        if not os.path.exists(app.config['BULK_EXPORT_FOLDER']):
+            os.makedirs(app.config['BULK_EXPORT_FOLDER'])
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'user_id': session['user_id'],
+            'format': export_format,
+            'path': os.path.join(app.config['BULK_EXPORT_FOLDER'], f'{job_id}.{export_format}'),
+            'items': items,
+            'total': len(items),
+            'completed': 0,
+            'status': 'rendering',
+            'finished_at': None
+        }
+        with bulk_export_jobs_lock:
+            bulk_export_jobs[job_id] = job
+
+        Thread(target=run_bulk_export, args=(job,), daemon=True).start()
+        logging.info(f"تم بدء تصدير مجمع لعدد {len(items)} قرار بواسطة المستخدم {session['full_name']}.")
+
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'total': len(items),
+            'status_url': url_for('bulk_export_status', job_id=job_id),
+            'download_url': url_for('bulk_export_download', job_id=job_id)
+        }), 202
+    except ValueError:
+        return jsonify({'success': False, 'message': 'بيانات التصدير غير صالحة'})
+    except Exception as e:
+        logging.error(f"خطأ أثناء بدء التصدير المجمع: {e}")
+        return jsonify({'success': False, 'message': 'حدث خطأ أثناء التصدير المجمع'})
+
+def get_bulk_export_job(job_id):
+    with bulk_export_jobs_lock:
+        job = bulk_export_jobs.get(job_id)
+    if job is None or job['user_id'] != session.get('user_id'):
+        return None
+    return job
+
+@app.route('/bulk_export_decisions/<job_id>')
+def bulk_export_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
+
+    job = get_bulk_export_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'المهمة غير موجودة'}), 404
+
+    return jsonify({
+        'success': job['status'] != 'failed',
+        'job_id': job_id,
+        'status': job['status'],
+        'completed': job['completed'],
+        'total': job['total'],
+        'progress': round(job['completed'] * 100 / job['total'], 1)
+    })
+
+@app.route('/bulk_export_decisions/<job_id>/download')
+def bulk_export_download(job_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
+
+    job = get_bulk_export_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'المهمة غير موجودة'}), 404
+    if job['status'] != 'done':
+        return jsonify({'success': False, 'status': job['status'], 'message': 'لم يكتمل التصدير بعد'}), 409
+
+    mimetype = 'application/zip' if job['format'] == 'zip' else 'application/pdf'
+    return send_file(job['path'], mimetype=mimetype, as_attachment=True,
+                     download_name=f"decisions_{datetime.now().strftime('%Y%m%d')}.{job['format']}")
+
 @app.route('/previous_draft')
 def previous_draft():
     if 'user_id' not in session:
@@ -811,84 +2081,44 @@ def previous_draft():
     # جلب governorate من الجلسة
     governorate = session.get('governorate', 'غير محدد')
 
-    # جلب جميع المسودات من LeadershipCommittee
-    committee_drafts = LeadershipCommittee.query.filter_by(status='draft', user_id=session['user_id']).order_by(LeadershipCommittee.created_at.desc()).all()
-    
-    # جلب جميع المسودات من AppointmentDecision
-    appointment_drafts = AppointmentDecision.query.filter_by(status='draft', user_id=session['user_id']).order_by(AppointmentDecision.created_at.desc()).all()
-
+    # جلب الأعمدة المعروضة في القائمة فقط؛ النصوص الطويلة والأعضاء يتم جلبها عند فتح التفاصيل
     draft_list = []
+    for draft_type, model in [('committee', LeadershipCommittee), ('appointment', AppointmentDecision)]:
+        drafts = db.session.query(model.id, model.decision_number, model.decision_date).filter_by(
+            status='draft', user_id=session['user_id']
+        ).order_by(model.created_at.desc())
+        for draft in drafts:
+            draft_list.append({
+                'type': draft_type,
+                'id': draft.id,
+                'decision_number': draft.decision_number,
+                'decision_date': draft.decision_date.strftime('%Y-%m-%d'),
+                'governorate': governorate
+            })
 
-    # معالجة مسودات LeadershipCommittee
-    for draft in committee_drafts:
-        draft_data = {
-            'type': 'committee',
-            'decision_number': draft.decision_number,
-            'decision_date': draft.decision_date.strftime('%Y-%m-%d'),
-            'governorate': governorate,
-            'preamble': draft.preamble,
-            'article_one_text': draft.article_one_text,
-            'chairperson_name': draft.chairperson_name,
-            'chairperson_national_id': draft.chairperson_national_id,
-            'chairperson_phone': draft.chairperson_phone,
-            'admin_member_name': draft.admin_member_name,
-            'admin_member_national_id': draft.admin_member_national_id,
-            'admin_member_phone': draft.admin_member_phone,
-            'hr_member_name': draft.hr_member_name,
-            'hr_member_national_id': draft.hr_member_national_id,
-            'hr_member_phone': draft.hr_member_phone,
-            'it_member_name': draft.it_member_name,
-            'it_member_national_id': draft.it_member_national_id,
-            'it_member_phone': draft.it_member_phone,
-            'legal_member_name': draft.legal_member_name,
-            'legal_member_national_id': draft.legal_member_national_id,
-            'legal_member_phone': draft.legal_member_phone,
-            'other_member_1_name': draft.other_member_1_name,
-            'other_member_1_national_id': draft.other_member_1_national_id,
-            'other_member_1_phone': draft.other_member_1_phone,
-            'other_member_2_name': draft.other_member_2_name,
-            'other_member_2_national_id': draft.other_member_2_national_id,
-            'other_member_2_phone': draft.other_member_2_phone,
-            'article_two_text': draft.article_two_text,
-            'secretary_name': draft.secretary_name,
-            'secretary_national_id': draft.secretary_national_id,
-            'secretary_phone': draft.secretary_phone,
-            'secretary_member_1_name': draft.secretary_member_1_name,
-            'secretary_member_1_national_id': draft.secretary_member_1_national_id,
-            'secretary_member_1_phone': draft.secretary_member_1_phone,
-            'secretary_member_2_name': draft.secretary_member_2_name,
-            'secretary_member_2_national_id': draft.secretary_member_2_national_id,
-            'secretary_member_2_phone': draft.secretary_member_2_phone,
-            'committee_tasks': draft.committee_tasks,
-            'article_four': draft.article_four,
-            'competent_authority': draft.competent_authority,
-            'authority_approval': draft.authority_approval
-        }
-        draft_list.append(draft_data)
-
-    # معالجة مسودات AppointmentDecision
-    for draft in appointment_drafts:
-        draft_data = {
-            'type': 'appointment',
-            'decision_number': draft.decision_number,
-            'decision_date': draft.decision_date.strftime('%Y-%m-%d'),
-            'governorate': governorate,
-            'announcement_number': draft.announcement_number,
-            'candidate_code': draft.candidate_code,
-            'article_one_text': draft.article_one_text,
-            'article_two_text': draft.article_two_text,
-            'article_three_text': draft.article_three_text,
-            'competent_authority': draft.competent_authority,
-            'authority_approval': draft.authority_approval,
-            'files': {
-                'announcement_file': draft.announcement_file,
-                'candidate_file': draft.candidate_file,
-                'decision_file': draft.decision_file
-            }
-        }
-        draft_list.append(draft_data)
+    return render_template('previous_draft.html', drafts=draft_list, pdf_merge_available=PDF_MERGE_AVAILABLE)
+
+@app.route('/draft_details/<draft_type>/<int:draft_id>')
+def draft_details(draft_type, draft_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
+
+    if draft_type == 'committee':
+        query = LeadershipCommittee.query.options(selectinload(LeadershipCommittee.members))
+        to_dict = committee_to_dict
+    elif draft_type == 'appointment':
+        query = AppointmentDecision.query
+        to_dict = appointment_to_dict
+    else:
+        return jsonify({'success': False, 'message': 'نوع المسودة غير صالح'})
+
+    draft = query.filter_by(id=draft_id, user_id=session['user_id'], status='draft').first()
+    if not draft:
+        return jsonify({'success': False, 'message': 'المسودة غير موجودة أو ليس لديك صلاحية لعرضها'}), 404
 
-    return render_template('previous_draft.html', drafts=draft_list)
+    data = to_dict(draft)
+    data.update(type=draft_type, governorate=session.get('governorate', 'غير محدد'))
+    return jsonify({'success': True, 'data': data})
 
 @app.route('/delete_draft/<decision_number>/<draft_type>', methods=['POST'])
 def delete_draft(decision_number, draft_type):
@@ -980,51 +2210,54 @@ def inbox():
         # جلب المعاملات الواردة للمستخدم
         user_id = session['user_id']
         try:
-            incoming_requests = Request.query.filter(
-                Request.user_id == user_id
-            ).order_by(Request.created_at.desc()).all()
+            incoming_requests, next_cursor = keyset_page(
+                Request.query.options(joinedload(Request.user)).filter(Request.user_id == user_id),
+                Request.created_at, Request.id
+            )
         except SQLAlchemyError as e:
             logging.error(f"خطأ في قاعدة البيانات: {e}")
             raise DatabaseError('حدث خطأ أثناء جلب المعاملات')
         
-        # جلب المرفقات لكل معاملة
+        # جلب مرفقات جميع معاملات الصفحة في استعلام واحد بدلاً من فحص كل ملف على القرص
+        # (الملفات المفقودة يحددها مدقق المرفقات في الخلفية)
         attachments_data = []
-        for req in incoming_requests:
-            if req.attachments:
-                try:
-                    attachments = json.loads(req.attachments)
-                except json.JSONDecodeError as e:
-                    logging.error(f"خطأ في تحليل JSON للمرفقات: {e}")
-                    continue  # تخطي هذا الطلب والمتابعة مع التالي
-                
-                for attachment in attachments:
-                    try:
-                        file_path = os.path.join(app.config['UPLOAD_FOLDER'], attachment)
-                        if not os.path.exists(file_path):
-                            logging.warning(f"الملف غير موجود: {file_path}")
-                            continue
-                        
-                        user = User.query.get(req.user_id)
-                        if not user:
-                            logging.warning(f"المستخدم غير موجود: {req.user_id}")
-                            continue
-                            
-                        file_info = {
-                            'name': attachment,
-                            'type': attachment.split('.')[-1].lower(),
-                            'date': req.created_at.strftime('%Y-%m-%d'),
-                            'size': get_file_size(file_path),
-                            'uploader': user.full_name,
-                            'request_id': req.id
-                        }
-                        attachments_data.append(file_info)
-                    except Exception as e:
-                        logging.error(f"خطأ في معالجة المرفق {attachment}: {e}")
-                        continue
+        positions = {req.id: i for i, req in enumerate(incoming_requests)}
+        if positions:
+            try:
+                rows = db.session.query(Attachment, User.full_name) \
+                    .join(User, Attachment.uploaded_by == User.id) \
+                    .filter(Attachment.request_id.in_(positions), Attachment.missing.is_(False)) \
+                    .order_by(Attachment.id) \
+                    .all()
+            except SQLAlchemyError as e:
+                logging.error(f"خطأ في قاعدة البيانات: {e}")
+                raise DatabaseError('حدث خطأ أثناء جلب المرفقات')
+
+            rows.sort(key=lambda row: positions[row[0].request_id])
+            for attachment, uploader in rows:
+                attachments_data.append({
+                    'name': attachment.filename,
+                    'type': attachment.filename.split('.')[-1].lower(),
+                    'date': attachment.created_at.strftime('%Y-%m-%d'),
+                    'size': format_file_size(attachment.size),
+                    'uploader': uploader,
+                    'request_id': attachment.request_id
+                })
         
+        if request.args.get('format') == 'json':
+            return jsonify({
+                'success': True,
+                'html': {
+                    'attachments': render_rows('inbox_attachment', attachments_data),
+                    'details': render_rows('inbox_request_details', incoming_requests),
+                    'history': render_rows('inbox_request_history', incoming_requests)
+                },
+                'next_cursor': next_cursor
+            })
         return render_template('inbox.html', 
                              attachments=attachments_data,
-                             requests=incoming_requests)
+                             requests=incoming_requests,
+                             next_cursor=next_cursor)
                              
     except DatabaseError as e:
         logging.error(f"خطأ في قاعدة البيانات: {e}")
@@ -1036,6 +2269,9 @@ def inbox():
         flash('حدث خطأ في إعدادات النظام', 'error')
         return redirect(url_for('dashboard'))
         
+    except InvalidCursorError:
+        raise
+        
     except Exception as e:
         logging.error(f"خطأ في صفحة الوارد: {e}")
         flash('حدث خطأ أثناء تحميل صفحة الوارد', 'error')
@@ -1050,8 +2286,7 @@ def view_attachment(request_id, filename):
         # التحقق من صلاحية الوصول للمرفق
         request = Request.query.get_or_404(request_id)
         if request.user_id != session['user_id']:
-            allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-            if not any(role in session['roles'] for role in allowed_roles):
+            if not has_permissions(Permission.MANAGE_REQUESTS):
                 return jsonify({'success': False, 'message': 'ليس لديك صلاحية لعرض هذا المرفق'})
         
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
@@ -1078,8 +2313,7 @@ def download_attachment(request_id, filename):
         # التحقق من صلاحية تحميل المرفق
         request = Request.query.get_or_404(request_id)
         if request.user_id != session['user_id']:
-            allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-            if not any(role in session['roles'] for role in allowed_roles):
+            if not has_permissions(Permission.MANAGE_REQUESTS):
                 return jsonify({'success': False, 'message': 'ليس لديك صلاحية لتحميل هذا المرفق'})
         
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
@@ -1102,8 +2336,7 @@ def forward_request(request_id):
         
         # التحقق من صلاحية تحويل الطلب
         if request_obj.user_id != session['user_id']:
-            allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-            if not any(role in session['roles'] for role in allowed_roles):
+            if not has_permissions(Permission.MANAGE_REQUESTS):
                 return jsonify({'success': False, 'message': 'ليس لديك صلاحية لتحويل هذا الطلب'})
         
         forward_to = request.form.get('forward_to')
@@ -1152,8 +2385,7 @@ def return_request(request_id):
         
         # التحقق من صلاحية رد الطلب
         if request_obj.user_id != session['user_id']:
-            allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-            if not any(role in session['roles'] for role in allowed_roles):
+            if not has_permissions(Permission.MANAGE_REQUESTS):
                 return jsonify({'success': False, 'message': 'ليس لديك صلاحية لرد هذا الطلب'})
         
         reason = request.form.get('reason')
@@ -1194,8 +2426,7 @@ def save_request(request_id):
         
         # التحقق من صلاحية حفظ الطلب
         if request_obj.user_id != session['user_id']:
-            allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-            if not any(role in session['roles'] for role in allowed_roles):
+            if not has_permissions(Permission.MANAGE_REQUESTS):
                 return jsonify({'success': False, 'message': 'ليس لديك صلاحية لحفظ هذا الطلب'})
         
         notes = request.form.get('notes')
@@ -1215,15 +2446,20 @@ def save_request(request_id):
         logging.error(f"خطأ في حفظ الطلب: {e}")
         return jsonify({'success': False, 'message': 'حدث خطأ أثناء حفظ الطلب'})
 
+def format_file_size(size):
+    """تنسيق حجم بالبايت بوحدة مناسبة"""
+    if size is None:
+        return "غير معروف"
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
 def get_file_size(file_path):
     """حساب حجم الملف بتنسيق مناسب"""
     try:
-        size = os.path.getsize(file_path)
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024:
-                return f"{size:.1f} {unit}"
-            size /= 1024
-        return f"{size:.1f} TB"
+        return format_file_size(os.path.getsize(file_path))
     except:
         return "غير معروف"
 
@@ -1234,8 +2470,10 @@ def outbox():
         return redirect(url_for('index'))
     
     # جلب الوظائف التي أنشأها المستخدم الحالي
-    user_jobs = Job.query.filter_by(user_id=session['user_id']).all()
-    return render_template('outbox.html', jobs=user_jobs)
+    user_jobs, next_cursor = keyset_page(
+        Job.query.options(load_only(*JOB_LIST_COLUMNS)).filter_by(user_id=session['user_id']), Job.created_at, Job.id
+    )
+    return render_template('outbox.html', jobs=user_jobs, next_cursor=next_cursor)
 
 @app.route('/job_results')
 def job_results():
@@ -1244,8 +2482,12 @@ def job_results():
         return redirect(url_for('index'))
     
     # جلب الوظائف المكتملة
-    jobs = Job.query.filter_by(status='completed').all()
-    return render_template('job_results.html', jobs=jobs)
+    jobs, next_cursor = keyset_page(
+        Job.query.options(load_only(*JOB_LIST_COLUMNS)).filter_by(status='completed'), Job.created_at, Job.id
+    )
+    if request.args.get('format') == 'json':
+        return jsonify({'success': True, 'html': {'rows': render_rows('job_result_row', jobs)}, 'next_cursor': next_cursor})
+    return render_template('job_results.html', jobs=jobs, next_cursor=next_cursor)
 
 @app.route('/reports')
 def reports():
@@ -1282,8 +2524,12 @@ def jobs_in_progress():
         return redirect(url_for('index'))
     
     # جلب الوظائف التي تحت الإجراء
-    jobs = Job.query.filter_by(status='pending').all()
-    return render_template('jobs_in_progress.html', jobs=jobs)
+    jobs, next_cursor = keyset_page(
+        Job.query.options(load_only(*JOB_LIST_COLUMNS)).filter_by(status='pending'), Job.created_at, Job.id
+    )
+    if request.args.get('format') == 'json':
+        return jsonify({'success': True, 'html': {'rows': render_rows('job_in_progress_row', jobs)}, 'next_cursor': next_cursor})
+    return render_template('jobs_in_progress.html', jobs=jobs, next_cursor=next_cursor)
 
 @app.route('/job_progress/<job_code>')
 def job_progress(job_code):
@@ -1302,6 +2548,7 @@ def job_progress(job_code):
         'status': job.status,
         'created_at': job.created_at.strftime('%Y-%m-%d'),
         'deadline': job.deadline.strftime('%Y-%m-%d'),
+        'job_description': job.job_description,
         'progress_stage': 'تحت المراجعة',  # يمكن تغييرها لاحقاً بناءً على حالة الوظيفة الفعلية
         'details': 'تفاصيل إضافية حول تقدم الوظيفة ستظهر هنا.'
     }
@@ -1385,6 +2632,8 @@ def issue_appointment_decision():
             try:
                 db.session.add(new_appointment)
                 db.session.commit()
+                pdf_cache.invalidate('appointment', session['user_id'])
+                prerender_decision_pdf('appointment', new_appointment)
                 logging.info(f"تم إنشاء قرار تعيين (رقم القرار: {new_appointment.decision_number}) بواسطة المستخدم {session['full_name']}.")
                 flash('تم إنشاء قرار التعيين بنجاح!', 'success')
             except Exception as e:
@@ -1432,30 +2681,8 @@ def issue_appointment_decision():
                 flash('حدث خطأ أثناء الانتقال للخطوة التالية، حاول مرة أخرى.', 'error')
             return redirect(url_for('issue_appointment_decision'))
 
-    # جلب آخر قرار تم إنشاؤه فقط (status='created')
-    latest_appointment = AppointmentDecision.query.filter_by(status='created', user_id=session['user_id']).order_by(AppointmentDecision.created_at.desc()).first()
-    if latest_appointment:
-        session['latest_appointment'] = {
-            'decision_number': latest_appointment.decision_number,
-            'decision_date': latest_appointment.decision_date.strftime('%Y-%m-%d'),
-            'governorate': latest_appointment.governorate,
-            'announcement_number': latest_appointment.announcement_number,
-            'candidate_code': latest_appointment.candidate_code,
-            'article_one_text': latest_appointment.article_one_text,
-            'article_two_text': latest_appointment.article_two_text,
-            'article_three_text': latest_appointment.article_three_text,
-            'competent_authority': latest_appointment.competent_authority,
-            'authority_approval': latest_appointment.authority_approval,
-            'files': {
-                'announcement_file': latest_appointment.announcement_file,
-                'candidate_file': latest_appointment.candidate_file,
-                'decision_file': latest_appointment.decision_file
-            },
-            'type': 'appointment'
-        }
-    else:
-        session.pop('latest_appointment', None)
-
+    # آخر قرار منشأ يتم جلبه من قاعدة البيانات عند عرض ملف PDF (get_latest_decision)، لذا لا يتم نسخه إلى الجلسة
+    # حتى لا تتحول كل زيارة للصفحة إلى عملية كتابة في جدول الجلسات
     return render_template('issue_appointment_decision.html', governorate=governorate)
 
 @app.route('/form_leadership_committee', methods=['GET', 'POST'])
@@ -1470,18 +2697,8 @@ def form_leadership_committee():
         try:
             decision_date = datetime.strptime(request.form['decision_date'], '%Y-%m-%d').date()
 
-            national_ids = [
-                request.form['chairperson_national_id'],
-                request.form['admin_member_national_id'],
-                request.form['hr_member_national_id'],
-                request.form['it_member_national_id'],
-                request.form['legal_member_national_id'],
-                request.form['other_member_1_national_id'],
-                request.form['other_member_2_national_id'],
-                request.form['secretary_national_id'],
-                request.form['secretary_member_1_national_id'],
-                request.form['secretary_member_2_national_id']
-            ]
+            members = committee_members_from(request.form)
+            national_ids = [member['national_id'] for member in members]
 
             if len(national_ids) != len(set(national_ids)):
                 flash('يجب أن تكون جميع الأرقام القومية مختلفة.', 'error')
@@ -1494,18 +2711,7 @@ def form_leadership_committee():
                     logging.warning(f"رقم قومي غير صالح: {nid}")
                     return redirect(url_for('form_leadership_committee'))
 
-            phone_numbers = [
-                request.form['chairperson_phone'],
-                request.form['admin_member_phone'],
-                request.form['hr_member_phone'],
-                request.form['it_member_phone'],
-                request.form['legal_member_phone'],
-                request.form['other_member_1_phone'],
-                request.form['other_member_2_phone'],
-                request.form['secretary_phone'],
-                request.form['secretary_member_1_phone'],
-                request.form['secretary_member_2_phone']
-            ]
+            phone_numbers = [member['phone'] for member in members]
 
             for phone in phone_numbers:
                 if not validate_phone_number(phone):
@@ -1518,37 +2724,7 @@ def form_leadership_committee():
                 decision_number=request.form['decision_number'],
                 decision_date=decision_date,
                 preamble=request.form['preamble'],
-                chairperson_name=request.form['chairperson_name'],
-                chairperson_national_id=request.form['chairperson_national_id'],
-                chairperson_phone=request.form['chairperson_phone'],
-                admin_member_name=request.form['admin_member_name'],
-                admin_member_national_id=request.form['admin_member_national_id'],
-                admin_member_phone=request.form['admin_member_phone'],
-                hr_member_name=request.form['hr_member_name'],
-                hr_member_national_id=request.form['hr_member_national_id'],
-                hr_member_phone=request.form['hr_member_phone'],
-                it_member_name=request.form['it_member_name'],
-                it_member_national_id=request.form['it_member_national_id'],
-                it_member_phone=request.form['it_member_phone'],
-                legal_member_name=request.form['legal_member_name'],
-                legal_member_national_id=request.form['legal_member_national_id'],
-                legal_member_phone=request.form['legal_member_phone'],
-                other_member_1_name=request.form['other_member_1_name'],
-                other_member_1_national_id=request.form['other_member_1_national_id'],
-                other_member_1_phone=request.form['other_member_1_phone'],
-                other_member_2_name=request.form['other_member_2_name'],
-                other_member_2_national_id=request.form['other_member_2_national_id'],
-                other_member_2_phone=request.form['other_member_2_phone'],
                 article_one_text=request.form['article_one_text'],
-                secretary_name=request.form['secretary_name'],
-                secretary_national_id=request.form['secretary_national_id'],
-                secretary_phone=request.form['secretary_phone'],
-                secretary_member_1_name=request.form['secretary_member_1_name'],
-                secretary_member_1_national_id=request.form['secretary_member_1_national_id'],
-                secretary_member_1_phone=request.form['secretary_member_1_phone'],
-                secretary_member_2_name=request.form['secretary_member_2_name'],
-                secretary_member_2_national_id=request.form['secretary_member_2_national_id'],
-                secretary_member_2_phone=request.form['secretary_member_2_phone'],
                 article_two_text=request.form['article_two_text'],
                 committee_tasks=request.form['committee_tasks'],
                 article_four=request.form['article_four'],
@@ -1561,15 +2737,17 @@ def form_leadership_committee():
 
             if action == 'create_decision':
                 new_committee.status = 'created'
-                db.session.add(new_committee)
+                add_committee_with_members(new_committee, members)
                 db.session.commit()
+                pdf_cache.invalidate('committee', session['user_id'])
+                prerender_decision_pdf('committee', new_committee)
                 logging.info(f"تم إنشاء قرار لجنة (رقم القرار: {new_committee.decision_number}) بواسطة المستخدم {session['full_name']}.")
                 flash('تم إنشاء قرار بتشكيل لجنة وظائف قيادية', 'success')
                 return redirect(url_for('form_leadership_committee'))
 
             elif action == 'save_draft':
                 new_committee.status = 'draft'
-                db.session.add(new_committee)
+                add_committee_with_members(new_committee, members)
                 db.session.commit()
                 logging.info(f"تم حفظ لجنة كمسودة (رقم القرار: {new_committee.decision_number}) بواسطة المستخدم {session['full_name']}.")
                 flash('تم حفظ اللجنة كمسودة بنجاح!', 'success')
@@ -1577,7 +2755,7 @@ def form_leadership_committee():
 
             elif action == 'refer_to':
                 new_committee.status = 'referred'
-                db.session.add(new_committee)
+                add_committee_with_members(new_committee, members)
                 db.session.commit()
                 logging.info(f"تم إحالة لجنة (رقم القرار: {new_committee.decision_number}) بواسطة المستخدم {session['full_name']}.")
                 flash('تم إحالة اللجنة بنجاح!', 'success')
@@ -1585,7 +2763,7 @@ def form_leadership_committee():
 
             elif action == 'next':
                 new_committee.status = 'next'
-                db.session.add(new_committee)
+                add_committee_with_members(new_committee, members)
                 db.session.commit()
                 logging.info(f"تم الانتقال للخطوة التالية للجنة (رقم القرار: {new_committee.decision_number}) بواسطة المستخدم {session['full_name']}.")
                 flash('تم الانتقال للخطوة التالية بنجاح!', 'success')
@@ -1597,54 +2775,7 @@ def form_leadership_committee():
             flash('حدث خطأ أثناء تشكيل اللجنة، حاول مرة أخرى.', 'error')
             return redirect(url_for('form_leadership_committee'))
 
-    # جلب آخر قرار تم إنشاؤه فقط (status='created')
-    latest_committee = LeadershipCommittee.query.filter_by(status='created', user_id=session['user_id']).order_by(LeadershipCommittee.created_at.desc()).first()
-    if latest_committee:
-        session['latest_committee'] = {
-            'decision_number': latest_committee.decision_number,
-            'decision_date': latest_committee.decision_date.strftime('%Y-%m-%d'),
-            'governorate': latest_committee.governorate,
-            'preamble': latest_committee.preamble,
-            'article_one_text': latest_committee.article_one_text,
-            'chairperson_name': latest_committee.chairperson_name,
-            'chairperson_national_id': latest_committee.chairperson_national_id,
-            'chairperson_phone': latest_committee.chairperson_phone,
-            'admin_member_name': latest_committee.admin_member_name,
-            'admin_member_national_id': latest_committee.admin_member_national_id,
-            'admin_member_phone': latest_committee.admin_member_phone,
-            'hr_member_name': latest_committee.hr_member_name,
-            'hr_member_national_id': latest_committee.hr_member_national_id,
-            'hr_member_phone': latest_committee.hr_member_phone,
-            'it_member_name': latest_committee.it_member_name,
-            'it_member_national_id': latest_committee.it_member_national_id,
-            'it_member_phone': latest_committee.it_member_phone,
-            'legal_member_name': latest_committee.legal_member_name,
-            'legal_member_national_id': latest_committee.legal_member_national_id,
-            'legal_member_phone': latest_committee.legal_member_phone,
-            'other_member_1_name': latest_committee.other_member_1_name,
-            'other_member_1_national_id': latest_committee.other_member_1_national_id,
-            'other_member_1_phone': latest_committee.other_member_1_phone,
-            'other_member_2_name': latest_committee.other_member_2_name,
-            'other_member_2_national_id': latest_committee.other_member_2_national_id,
-            'other_member_2_phone': latest_committee.other_member_2_phone,
-            'article_two_text': latest_committee.article_two_text,
-            'secretary_name': latest_committee.secretary_name,
-            'secretary_national_id': latest_committee.secretary_national_id,
-            'secretary_phone': latest_committee.secretary_phone,
-            'secretary_member_1_name': latest_committee.secretary_member_1_name,
-            'secretary_member_1_national_id': latest_committee.secretary_member_1_national_id,
-            'secretary_member_1_phone': latest_committee.secretary_member_1_phone,
-            'secretary_member_2_name': latest_committee.secretary_member_2_name,
-            'secretary_member_2_national_id': latest_committee.secretary_member_2_national_id,
-            'secretary_member_2_phone': latest_committee.secretary_member_2_phone,
-            'committee_tasks': latest_committee.committee_tasks,
-            'article_four': latest_committee.article_four,
-            'competent_authority': latest_committee.competent_authority,
-            'authority_approval': latest_committee.authority_approval
-        }
-    else:
-        session.pop('latest_committee', None)
-
+    # آخر قرار منشأ يتم جلبه من قاعدة البيانات عند عرض ملف PDF، لذا لا يتم نسخه إلى الجلسة
     return render_template('form_leadership_committee.html', governorate=governorate)
 
 @app.route('/decisions')
@@ -1804,6 +2935,7 @@ def upload_file():
     try:
         filename = save_uploaded_file(file, folder)
         if filename:
+            db.session.commit()
             return jsonify({
                 'success': True,
                 'filename': filename,
@@ -1815,6 +2947,7 @@ def upload_file():
                 'message': 'نوع الملف غير مسموح به'
             })
     except Exception as e:
+        db.session.rollback()
         logging.error(f"خطأ أثناء رفع الملف: {e}")
         return jsonify({
             'success': False,
@@ -1908,13 +3041,16 @@ class TrainingProgram(db.Model):
     capacity = db.Column(db.Integer, nullable=False)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(50), default='active')  # active, completed, cancelled
+    status = db.mapped_column(db.String(50), default='active', active_history=True)  # active, completed, cancelled
 
     creator = db.relationship('User', backref=db.backref('created_programs', lazy=True))
 
 # نموذج تسجيل في برنامج تدريبي
 class TrainingRegistration(db.Model):
     __tablename__ = 'training_registrations'
+    __table_args__ = (
+        db.Index('ix_training_registrations_program_status', 'program_id', 'status'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     program_id = db.Column(db.Integer, db.ForeignKey('training_programs.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -2057,11 +3193,11 @@ class Evaluation(db.Model):
     skills_score = db.Column(db.Float, nullable=False)
     behavior_score = db.Column(db.Float, nullable=False)
     attendance_score = db.Column(db.Float, nullable=False)
-    overall_score = db.Column(db.Float, nullable=False)
+    overall_score = db.mapped_column(db.Float, nullable=False, active_history=True)
     strengths = db.Column(db.Text, nullable=True)
     weaknesses = db.Column(db.Text, nullable=True)
     recommendations = db.Column(db.Text, nullable=True)
-    status = db.Column(db.String(50), default='draft')  # draft, submitted, approved, rejected
+    status = db.mapped_column(db.String(50), default='draft', active_history=True)  # draft, submitted, approved, rejected
 
     user = db.relationship('User', foreign_keys=[user_id], backref=db.backref('received_evaluations', lazy=True))
     evaluator = db.relationship('User', foreign_keys=[evaluator_id], backref=db.backref('given_evaluations', lazy=True))
@@ -2149,16 +3285,8 @@ def update_evaluation(evaluation_id):
         })
 
 @app.route('/approve_evaluation/<int:evaluation_id>', methods=['POST'])
+@require_permissions(Permission.APPROVE_EVALUATIONS, 'ليس لديك صلاحية لاعتماد التقييمات')
 def approve_evaluation(evaluation_id):
-    if 'user_id' not in session:
-        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
-    
-    # التحقق من صلاحيات المستخدم
-    allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-    user_roles = session['roles']
-    if not any(role in user_roles for role in allowed_roles):
-        return jsonify({'success': False, 'message': 'ليس لديك صلاحية لاعتماد التقييمات'})
-    
     evaluation = Evaluation.query.get_or_404(evaluation_id)
     
     try:
@@ -2179,16 +3307,8 @@ def approve_evaluation(evaluation_id):
         })
 
 @app.route('/reject_evaluation/<int:evaluation_id>', methods=['POST'])
+@require_permissions(Permission.APPROVE_EVALUATIONS, 'ليس لديك صلاحية لرفض التقييمات')
 def reject_evaluation(evaluation_id):
-    if 'user_id' not in session:
-        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
-    
-    # التحقق من صلاحيات المستخدم
-    allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-    user_roles = session['roles']
-    if not any(role in user_roles for role in allowed_roles):
-        return jsonify({'success': False, 'message': 'ليس لديك صلاحية لرفض التقييمات'})
-    
     evaluation = Evaluation.query.get_or_404(evaluation_id)
     
     try:
@@ -2208,60 +3328,173 @@ def reject_evaluation(evaluation_id):
             'message': 'حدث خطأ أثناء رفض التقييم'
         })
 
+@app.route('/db_pool_stats')
+@require_permissions(Permission.VIEW_SYSTEM_STATS, 'ليس لديك صلاحية لعرض إحصائيات قاعدة البيانات')
+def db_pool_stats():
+    return jsonify({
+        'success': True,
+        'backend': db.engine.dialect.name,
+        'data': db_pool_metrics.stats(db.engine.pool)
+    })
+
+@app.route('/db_query_stats')
+@require_permissions(Permission.VIEW_SYSTEM_STATS, 'ليس لديك صلاحية لعرض إحصائيات قاعدة البيانات')
+def db_query_stats():
+    return jsonify({
+        'success': True,
+        'slow_query_threshold_ms': app.config['SLOW_QUERY_THRESHOLD_MS'],
+        'window': route_query_stats.window,
+        'data': route_query_stats.stats()
+    })
+
+# نموذج عدادات الإحصائيات: يتم تحديثها في نفس معاملة الكتابة بدلاً من إعادة حسابها عند كل طلب
+class StatCounter(db.Model):
+    __tablename__ = 'stat_counters'
+    name = db.Column(db.String(150), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+# الأعمدة التي تعتمد عليها العدادات لكل نموذج، ومساهمة كل سجل في العدادات حسب قيم هذه الأعمدة
+STAT_COUNTER_SOURCES = {
+    User: (('active', 'roles'), lambda v: {
+        'users.total': 1,
+        'users.active': 1 if v['active'] else 0,
+        f"users.by_role:{v['roles']}": 1
+    }),
+    Job: (('status',), lambda v: {
+        'jobs.total': 1,
+        f"jobs.by_status:{v['status']}": 1
+    }),
+    Evaluation: (('status', 'overall_score'), lambda v: {
+        'evaluations.total': 1,
+        f"evaluations.by_status:{v['status']}": 1,
+        'evaluations.score_sum': v['overall_score'] or 0
+    }),
+    TrainingProgram: (('status',), lambda v: {
+        'training.total_programs': 1,
+        'training.active_programs': 1 if v['status'] == 'active' else 0
+    }),
+    TrainingRegistration: ((), lambda v: {
+        'training.total_registrations': 1
+    })
+}
+
+def stat_counter_contribution(obj, fields, contribution, previous=False):
+    """مساهمة السجل في العدادات بقيمه الحالية، أو بقيمه قبل التعديل عند previous=True"""
+    state = db.inspect(obj)
+    values = {}
+    for field in fields:
+        history = state.attrs[field].history
+        values[field] = history.deleted[0] if previous and history.deleted else getattr(obj, field)
+    return contribution(values)
+
+def increment_stat_counters(connection, deltas):
+    """إضافة الفروق إلى العدادات باستخدام upsert حتى لا تتعارض الطلبات المتزامنة"""
+    table = StatCounter.__table__
+    for name, delta in deltas.items():
+        if connection.dialect.name in ('sqlite', 'postgresql'):
+            if connection.dialect.name == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            statement = insert(table).values(name=name, value=delta)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.name], set_={'value': table.c.value + delta}
+            ))
+        elif not connection.execute(table.update().where(table.c.name == name).values(value=table.c.value + delta)).rowcount:
+            connection.execute(table.insert().values(name=name, value=delta))
+
+@db.event.listens_for(db.session, 'after_flush')
+def update_stat_counters(session, flush_context):
+    deltas = {}
+    def add(contribution, sign):
+        for name, amount in contribution.items():
+            deltas[name] = deltas.get(name, 0) + sign * amount
+
+    for obj in session.new:
+        if type(obj) in STAT_COUNTER_SOURCES:
+            add(stat_counter_contribution(obj, *STAT_COUNTER_SOURCES[type(obj)]), 1)
+    for obj in session.deleted:
+        if type(obj) in STAT_COUNTER_SOURCES:
+            add(stat_counter_contribution(obj, *STAT_COUNTER_SOURCES[type(obj)], previous=True), -1)
+    for obj in session.dirty:
+        if type(obj) in STAT_COUNTER_SOURCES and session.is_modified(obj):
+            add(stat_counter_contribution(obj, *STAT_COUNTER_SOURCES[type(obj)], previous=True), -1)
+            add(stat_counter_contribution(obj, *STAT_COUNTER_SOURCES[type(obj)]), 1)
+
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if deltas:
+        increment_stat_counters(session.connection(), deltas)
+        session.info['stat_counters_changed'] = True
+
+@db.event.listens_for(db.session, 'after_commit')
+def invalidate_statistics_cache(session):
+    # إلغاء الإحصائيات المخزنة مؤقتاً بعد حفظ التعديلات فقط، وليس عند التراجع عنها
+    if session.info.pop('stat_counters_changed', False):
+        cache.invalidate_tags('statistics')
+
+@db.event.listens_for(db.session, 'after_rollback')
+def discard_statistics_changes(session):
+    session.info.pop('stat_counters_changed', None)
+
+def compute_stat_counters():
+    """حساب جميع العدادات من الجداول مباشرة (يستخدم في إعادة البناء)"""
+    counters = {
+        'users.total': User.query.count(),
+        'users.active': User.query.filter_by(active=True).count(),
+        'jobs.total': Job.query.count(),
+        'evaluations.total': Evaluation.query.count(),
+        'evaluations.score_sum': db.session.query(db.func.sum(Evaluation.overall_score)).scalar() or 0,
+        'training.total_programs': TrainingProgram.query.count(),
+        'training.active_programs': TrainingProgram.query.filter_by(status='active').count(),
+        'training.total_registrations': TrainingRegistration.query.count()
+    }
+    for roles, count in db.session.query(User.roles, db.func.count(User.id)).group_by(User.roles):
+        counters[f'users.by_role:{roles}'] = count
+    for status, count in db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status):
+        counters[f'jobs.by_status:{status}'] = count
+    for status, count in db.session.query(Evaluation.status, db.func.count(Evaluation.id)).group_by(Evaluation.status):
+        counters[f'evaluations.by_status:{status}'] = count
+    return counters
+
+def read_stat_counters():
+    """قراءة جميع العدادات في استعلام واحد وتحويلها إلى شكل استجابة /statistics"""
+    counters = dict(db.session.query(StatCounter.name, StatCounter.value).all())
+
+    def count(name):
+        return int(counters.get(name, 0))
+
+    def grouped(prefix):
+        return {name[len(prefix):]: int(value) for name, value in counters.items() if name.startswith(prefix) and value}
+
+    return {
+        'users': {
+            'total': count('users.total'),
+            'active': count('users.active'),
+            'by_role': grouped('users.by_role:')
+        },
+        'jobs': {
+            'total': count('jobs.total'),
+            'by_status': grouped('jobs.by_status:')
+        },
+        'evaluations': {
+            'total': count('evaluations.total'),
+            'by_status': grouped('evaluations.by_status:'),
+            'average_score': round(counters.get('evaluations.score_sum', 0) / count('evaluations.total'), 2) if count('evaluations.total') else 0
+        },
+        'training': {
+            'total_programs': count('training.total_programs'),
+            'active_programs': count('training.active_programs'),
+            'total_registrations': count('training.total_registrations')
+        }
+    }
+
 @app.route('/statistics')
+@require_permissions(Permission.VIEW_SYSTEM_STATS, 'ليس لديك صلاحية لعرض الإحصائيات')
 def get_statistics():
-    if 'user_id' not in session:
-        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
-    
-    # التحقق من صلاحيات المستخدم
-    allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-    user_roles = session['roles']
-    if not any(role in user_roles for role in allowed_roles):
-        return jsonify({'success': False, 'message': 'ليس لديك صلاحية لعرض الإحصائيات'})
-    
     try:
-        # إحصائيات المستخدمين
-        total_users = User.query.count()
-        active_users = User.query.filter_by(is_active=True).count()
-        users_by_role = db.session.query(User.roles, db.func.count(User.id)).group_by(User.roles).all()
-        
-        # إحصائيات الوظائف
-        total_jobs = Job.query.count()
-        jobs_by_status = db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all()
-        
-        # إحصائيات التقييمات
-        total_evaluations = Evaluation.query.count()
-        evaluations_by_status = db.session.query(Evaluation.status, db.func.count(Evaluation.id)).group_by(Evaluation.status).all()
-        avg_overall_score = db.session.query(db.func.avg(Evaluation.overall_score)).scalar() or 0
-        
-        # إحصائيات البرامج التدريبية
-        total_programs = TrainingProgram.query.count()
-        active_programs = TrainingProgram.query.filter_by(status='active').count()
-        total_registrations = TrainingRegistration.query.count()
-        
         return jsonify({
             'success': True,
-            'data': {
-                'users': {
-                    'total': total_users,
-                    'active': active_users,
-                    'by_role': dict(users_by_role)
-                },
-                'jobs': {
-                    'total': total_jobs,
-                    'by_status': dict(jobs_by_status)
-                },
-                'evaluations': {
-                    'total': total_evaluations,
-                    'by_status': dict(evaluations_by_status),
-                    'average_score': round(avg_overall_score, 2)
-                },
-                'training': {
-                    'total_programs': total_programs,
-                    'active_programs': active_programs,
-                    'total_registrations': total_registrations
-                }
-            }
+            'data': cache.get_or_set('statistics', read_stat_counters, tags=('statistics',))
         })
     except Exception as e:
         logging.error(f"خطأ أثناء جلب الإحصائيات: {e}")
@@ -2270,117 +3503,350 @@ def get_statistics():
             'message': 'حدث خطأ أثناء جلب الإحصائيات'
         })
 
+# محرك التقارير: قراءة السجلات على دفعات من قاعدة البيانات وكتابتها في جداول مقسمة على صفحات
+report_font_name = None
+report_font_lock = Lock()
+
+def get_report_font():
+    """تسجيل الخط العربي مرة واحدة فقط طوال عمر التطبيق"""
+    global report_font_name
+    with report_font_lock:
+        if report_font_name is None:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+
+            font_path = app.config['REPORT_FONT_PATH']
+            try:
+                pdfmetrics.registerFont(TTFont('Arabic', font_path))
+                report_font_name = 'Arabic'
+            except Exception as e:
+                logging.warning(f"تعذر تحميل خط التقارير من {font_path}، سيتم استخدام الخط الافتراضي: {e}")
+                report_font_name = 'Helvetica'
+        return report_font_name
+
+def shape_report_text(text):
+    """تشكيل النص العربي واتجاهه للعرض في reportlab إذا كانت المكتبات متاحة"""
+    text = '' if text is None else str(text)
+    try:
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+    except ImportError:
+        return text
+    return get_display(arabic_reshaper.reshape(text))
+
+def format_report_datetime(value, fmt='%Y-%m-%d %H:%M:%S'):
+    return value.strftime(fmt) if value else ''
+
+def users_report_query(start_date, end_date):
+    return db.session.query(
+        User.id, User.full_name, User.email, User.roles, User.active, User.created_at
+    ).filter(
+        User.created_at >= start_date,
+        User.created_at <= end_date
+    ).order_by(User.id)
+
+def jobs_report_query(start_date, end_date):
+    return db.session.query(
+        Job.id, Job.job_title, Job.job_code, Job.governorate, Job.status, Job.user_id, Job.created_at
+    ).filter(
+        Job.created_at >= start_date,
+        Job.created_at <= end_date
+    ).order_by(Job.id)
+
+def evaluations_report_query(start_date, end_date):
+    evaluated_user = db.aliased(User)
+    evaluator_user = db.aliased(User)
+    return db.session.query(
+        Evaluation.id, evaluated_user.full_name, evaluator_user.full_name,
+        Evaluation.overall_score, Evaluation.status, Evaluation.evaluation_date
+    ).join(
+        evaluated_user, Evaluation.user_id == evaluated_user.id
+    ).join(
+        evaluator_user, Evaluation.evaluator_id == evaluator_user.id
+    ).filter(
+        Evaluation.evaluation_date >= start_date,
+        Evaluation.evaluation_date <= end_date
+    ).order_by(Evaluation.id)
+
+def training_report_query(start_date, end_date):
+    registrations = db.session.query(
+        TrainingRegistration.program_id,
+        db.func.count(TrainingRegistration.id).label('registrations_count')
+    ).group_by(TrainingRegistration.program_id).subquery()
+    return db.session.query(
+        TrainingProgram.id, TrainingProgram.title, TrainingProgram.start_date, TrainingProgram.end_date,
+        TrainingProgram.status, db.func.coalesce(registrations.c.registrations_count, 0)
+    ).outerjoin(
+        registrations, registrations.c.program_id == TrainingProgram.id
+    ).filter(
+        TrainingProgram.created_at >= start_date,
+        TrainingProgram.created_at <= end_date
+    ).order_by(TrainingProgram.id)
+
+def requests_report_query(start_date, end_date):
+    return db.session.query(
+        Request.id, User.full_name, Request.request_type, Request.title, Request.status, Request.created_at
+    ).join(
+        User, Request.user_id == User.id
+    ).filter(
+        Request.created_at >= start_date,
+        Request.created_at <= end_date
+    ).order_by(Request.id)
+
+# تعريف أنواع التقارير: العنوان والأعمدة (العنوان، العرض) والاستعلام وتنسيق الصف
+REPORT_DEFINITIONS = {
+    'users': {
+        'title': 'تقرير المستخدمين',
+        'columns': [('id', 40), ('full_name', 150), ('email', 190), ('roles', 110), ('active', 60), ('created_at', 130)],
+        'query': users_report_query,
+        'row': lambda r: [r[0], r[1], r[2], r[3], 'نعم' if r[4] else 'لا', format_report_datetime(r[5])]
+    },
+    'jobs': {
+        'title': 'تقرير الوظائف',
+        'columns': [('id', 40), ('job_title', 170), ('job_code', 90), ('governorate', 110), ('status', 90), ('created_by', 70), ('created_at', 130)],
+        'query': jobs_report_query,
+        'row': lambda r: [r[0], r[1], r[2], r[3], r[4], r[5], format_report_datetime(r[6])]
+    },
+    'evaluations': {
+        'title': 'تقرير التقييمات',
+        'columns': [('id', 40), ('user', 160), ('evaluator', 160), ('overall_score', 90), ('status', 90), ('evaluation_date', 130)],
+        'query': evaluations_report_query,
+        'row': lambda r: [r[0], r[1], r[2], round(r[3], 2), r[4], format_report_datetime(r[5])]
+    },
+    'training': {
+        'title': 'تقرير البرامج التدريبية',
+        'columns': [('id', 40), ('title', 220), ('start_date', 90), ('end_date', 90), ('status', 90), ('registrations_count', 110)],
+        'query': training_report_query,
+        'row': lambda r: [r[0], r[1], format_report_datetime(r[2], '%Y-%m-%d'), format_report_datetime(r[3], '%Y-%m-%d'), r[4], r[5]]
+    },
+    'requests': {
+        'title': 'تقرير الطلبات',
+        'columns': [('id', 40), ('user', 160), ('request_type', 100), ('title', 220), ('status', 90), ('created_at', 130)],
+        'query': requests_report_query,
+        'row': lambda r: [r[0], r[1], r[2], r[3], r[4], format_report_datetime(r[5])]
+    }
+}
+
+def iter_report_rows(report_type, start_date, end_date):
+    """قراءة صفوف التقرير على دفعات دون تحميل جميع السجلات في الذاكرة"""
+    definition = REPORT_DEFINITIONS[report_type]
+    query = definition['query'](start_date, end_date).yield_per(app.config['REPORT_CHUNK_SIZE'])
+    for row in query:
+        yield definition['row'](row)
+
+def write_report_pdf(report_type, rows, pdf_path):
+    """كتابة صفوف التقرير في جدول مقسم على صفحات مع تكرار رأس الجدول في كل صفحة"""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfbase import pdfmetrics
+
+    definition = REPORT_DEFINITIONS[report_type]
+    font_name = get_report_font()
+    page_width, page_height = landscape(A4)
+    margin = 30
+    row_height = 18
+    font_size = 9
+
+    c = canvas.Canvas(pdf_path, pagesize=(page_width, page_height), pageCompression=1)
+    page_number = 0
+
+    def fit_text(text, width):
+        text = shape_report_text(text)
+        while text and pdfmetrics.stringWidth(text, font_name, font_size) > width - 6:
+            text = text[:-1]
+        return text
+
+    def draw_row(values, y, header=False):
+        # ترتيب الأعمدة من اليمين إلى اليسار
+        x = page_width - margin
+        if header:
+            c.setFillGray(0.9)
+            c.rect(margin, y - 5, page_width - 2 * margin, row_height, stroke=0, fill=1)
+            c.setFillGray(0)
+        for value, (_, width) in zip(values, definition['columns']):
+            c.drawRightString(x - 3, y, fit_text(value, width))
+            x -= width
+        c.line(margin, y - 5, page_width - margin, y - 5)
+
+    def start_page():
+        nonlocal page_number
+        page_number += 1
+        c.setFont(font_name, 14)
+        c.drawRightString(page_width - margin, page_height - margin, shape_report_text(definition['title']))
+        c.setFont(font_name, font_size)
+        c.drawString(margin, margin / 2, f"{page_number}")
+        y = page_height - margin - 30
+        draw_row([name for name, _ in definition['columns']], y, header=True)
+        return y - row_height
+
+    y = start_page()
+    for values in rows:
+        if y < margin + row_height:
+            c.showPage()
+            y = start_page()
+        draw_row(values, y)
+        y -= row_height
+
+    c.save()
+
+class ReportStreamBuffer(io.RawIOBase):
+    """مخزن مؤقت غير قابل للتنقل يجمع ما يكتبه zipfile ليتم إرساله للعميل على دفعات"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def iter_report_csv(report_type, rows):
+    """إنتاج ملف CSV سطراً بسطر أثناء قراءة السجلات"""
+    import csv
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # علامة BOM ليتعرف Excel على الترميز العربي
+    buffer.write('\ufeff')
+    writer.writerow([name for name, _ in REPORT_DEFINITIONS[report_type]['columns']])
+    for count, values in enumerate(rows, 1):
+        writer.writerow(values)
+        if count % app.config['REPORT_CHUNK_SIZE'] == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+def xlsx_row(values):
+    """تحويل صف إلى XML ورقة العمل باستخدام نصوص مضمنة بدلاً من جدول النصوص المشتركة"""
+    from xml.sax.saxutils import escape
+
+    cells = []
+    for value in values:
+        if isinstance(value, bool) or value is None:
+            value = '' if value is None else str(value)
+        if isinstance(value, (int, float)):
+            cells.append(f'<c t="n"><v>{value}</v></c>')
+        else:
+            # حذف محارف التحكم غير المسموح بها في XML
+            text = ''.join(ch for ch in str(value) if ch >= ' ' or ch in '\t\n\r')
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+def iter_report_xlsx(report_type, rows):
+    """إنتاج ملف XLSX بشكل متدفق؛ يُضغط كل جزء ويُرسل فور قراءة دفعة من السجلات"""
+    stream = ReportStreamBuffer()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', XLSX_WORKBOOK.format(name=report_type))
+        archive.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        yield stream.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0" rightToLeft="1"/></sheetViews><sheetData>'
+            ).encode('utf-8'))
+            sheet.write(xlsx_row([name for name, _ in REPORT_DEFINITIONS[report_type]['columns']]).encode('utf-8'))
+            for count, values in enumerate(rows, 1):
+                sheet.write(xlsx_row(values).encode('utf-8'))
+                if count % app.config['REPORT_CHUNK_SIZE'] == 0:
+                    yield stream.drain()
+            sheet.write('</sheetData></worksheet>'.encode('utf-8'))
+    yield stream.drain()
+
+# صيغ التقارير المتدفقة: دالة الإنتاج ونوع المحتوى
+REPORT_STREAM_FORMATS = {
+    'csv': (iter_report_csv, 'text/csv'),  # يضيف Flask charset=utf-8 تلقائياً للأنواع النصية
+    'xlsx': (iter_report_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+}
+
+def set_content_disposition(response, disposition, filename):
+    """ترويسة Content-Disposition بنفس طريقة send_file: اسم بين علامات تنصيص، مع filename* للأسماء غير اللاتينية"""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        names = {
+            'filename': unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii'),
+            'filename*': f"UTF-8''{quote(filename, safe='!#$&+^`|~')}"
+        }
+    else:
+        names = {'filename': filename}
+    response.headers.set('Content-Disposition', disposition, **names)
+
 @app.route('/generate_report', methods=['POST'])
+@require_permissions(Permission.GENERATE_REPORTS, 'ليس لديك صلاحية لإنشاء التقارير')
 def generate_report():
-    if 'user_id' not in session:
-        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
-    
-    # التحقق من صلاحيات المستخدم
-    allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-    user_roles = session['roles']
-    if not any(role in user_roles for role in allowed_roles):
-        return jsonify({'success': False, 'message': 'ليس لديك صلاحية لإنشاء التقارير'})
-    
     try:
         report_type = request.form.get('report_type')
         start_date = datetime.strptime(request.form.get('start_date'), '%Y-%m-%d')
         end_date = datetime.strptime(request.form.get('end_date'), '%Y-%m-%d')
         
-        if report_type == 'users':
-            # تقرير المستخدمين
-            users = User.query.filter(
-                User.created_at >= start_date,
-                User.created_at <= end_date
-            ).all()
-            
-            report_data = [{
-                'id': user.id,
-                'full_name': user.full_name,
-                'email': user.email,
-                'roles': user.roles,
-                'is_active': user.is_active,
-                'created_at': user.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            } for user in users]
-            
-        elif report_type == 'jobs':
-            # تقرير الوظائف
-            jobs = Job.query.filter(
-                Job.created_at >= start_date,
-                Job.created_at <= end_date
-            ).all()
-            
-            report_data = [{
-                'id': job.id,
-                'title': job.title,
-                'department': job.department,
-                'status': job.status,
-                'created_by': job.created_by,
-                'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            } for job in jobs]
-            
-        elif report_type == 'evaluations':
-            # تقرير التقييمات
-            evaluations = Evaluation.query.filter(
-                Evaluation.evaluation_date >= start_date,
-                Evaluation.evaluation_date <= end_date
-            ).all()
-            
-            report_data = [{
-                'id': eval.id,
-                'user': eval.user.full_name,
-                'evaluator': eval.evaluator.full_name,
-                'overall_score': eval.overall_score,
-                'status': eval.status,
-                'evaluation_date': eval.evaluation_date.strftime('%Y-%m-%d %H:%M:%S')
-            } for eval in evaluations]
-            
-        elif report_type == 'training':
-            # تقرير البرامج التدريبية
-            programs = TrainingProgram.query.filter(
-                TrainingProgram.created_at >= start_date,
-                TrainingProgram.created_at <= end_date
-            ).all()
-            
-            report_data = [{
-                'id': program.id,
-                'title': program.title,
-                'start_date': program.start_date.strftime('%Y-%m-%d'),
-                'end_date': program.end_date.strftime('%Y-%m-%d'),
-                'status': program.status,
-                'registrations_count': len(program.registrations)
-            } for program in programs]
-            
-        else:
+        if report_type not in REPORT_DEFINITIONS:
             return jsonify({
                 'success': False,
                 'message': 'نوع التقرير غير صالح'
             })
-        
+
+        output_format = request.form.get('output_format', 'pdf')
+        if output_format in REPORT_STREAM_FORMATS:
+            # إرسال الصفوف للعميل أثناء قراءتها من قاعدة البيانات
+            stream_rows, mimetype = REPORT_STREAM_FORMATS[output_format]
+            filename = f'report_{report_type}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{output_format}'
+            response = Response(
+                stream_with_context(stream_rows(report_type, iter_report_rows(report_type, start_date, end_date))),
+                mimetype=mimetype
+            )
+            set_content_disposition(response, 'attachment', filename)
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+        elif output_format != 'pdf':
+            return jsonify({
+                'success': False,
+                'message': 'صيغة التقرير غير مدعومة'
+            })
+
         # إنشاء ملف PDF للتقرير
         pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f'report_{report_type}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf')
-        
-        # هنا يمكنك استخدام مكتبة مثل reportlab أو weasyprint لإنشاء ملف PDF
-        # هذا مثال بسيط باستخدام reportlab
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        
-        # تسجيل الخط العربي
-        pdfmetrics.registerFont(TTFont('Arabic', 'path/to/arabic/font.ttf'))
-        
-        c = canvas.Canvas(pdf_path, pagesize=letter)
-        c.setFont('Arabic', 12)
-        
-        # إضافة محتوى التقرير
-        y = 750
-        for item in report_data:
-            for key, value in item.items():
-                c.drawString(50, y, f"{key}: {value}")
-                y -= 20
-            y -= 20
-        
-        c.save()
+        write_report_pdf(report_type, iter_report_rows(report_type, start_date, end_date), pdf_path)
         
         return jsonify({
             'success': True,
@@ -2398,19 +3864,99 @@ def generate_report():
 # نموذج الطلبات
 class Request(db.Model):
     __tablename__ = 'requests'
+    __table_args__ = (
+        db.Index('ix_requests_user_created', 'user_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     request_type = db.Column(db.String(50), nullable=False)  # leave, transfer, promotion, etc.
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(50), default='pending')  # pending, approved, rejected
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     attachments = db.Column(db.Text, nullable=True)  # JSON string of file paths
     notes = db.Column(db.Text, nullable=True)
     
     user = db.relationship('User', backref=db.backref('requests', lazy=True))
 
+# بيانات المرفقات: يتم حفظها عند الرفع حتى لا تحتاج صفحات العرض إلى فحص الملفات على القرص
+class Attachment(db.Model):
+    __tablename__ = 'attachments'
+    __table_args__ = (
+        db.Index('ix_attachments_request_missing', 'request_id', 'missing'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, db.ForeignKey('requests.id'), nullable=True)  # فارغ للملفات المرفوعة بدون طلب
+    filename = db.Column(db.String(255), nullable=False)
+    folder = db.Column(db.String(255), nullable=False, default='')  # مجلد فرعي داخل مجلد التحميل
+    size = db.Column(db.BigInteger, nullable=True)  # بالبايت، فارغ للمرفقات القديمة حتى يفحصها المدقق
+    mime_type = db.Column(db.String(100), nullable=False)
+    checksum = db.Column(db.String(64), nullable=True)  # SHA-256
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    missing = db.Column(db.Boolean, nullable=False, default=False)  # يحدده مدقق المرفقات عند حذف الملف من القرص
+
+    request = db.relationship('Request', backref=db.backref('attachment_files', lazy=True))
+    uploader = db.relationship('User', backref=db.backref('uploaded_attachments', lazy=True))
+
+    @property
+    def path(self):
+        return os.path.join(app.config['UPLOAD_FOLDER'], self.folder, self.filename)
+
+def reconcile_attachments(batch_size=500):
+    """مطابقة جدول المرفقات مع الملفات على القرص وإرجاع (عدد المفحوص، عدد المفقود، عدد المكتملة بياناته)"""
+    checked = missing = filled = 0
+    last_id = 0
+    while True:
+        batch = Attachment.query.filter(Attachment.id > last_id).order_by(Attachment.id).limit(batch_size).all()
+        if not batch:
+            break
+        for attachment in batch:
+            try:
+                size = os.path.getsize(attachment.path)
+                # المرفقات المنقولة من عمود attachments القديم لا تحتوي على الحجم والبصمة
+                if attachment.checksum is None:
+                    attachment.size = size
+                    attachment.checksum = file_checksum(attachment.path)
+                    filled += 1
+                exists = True
+            except OSError:
+                exists = False
+
+            if attachment.missing == exists:
+                if exists:
+                    logging.info(f"تم العثور على الملف المرفق مرة أخرى: {attachment.path}")
+                else:
+                    logging.warning(f"الملف المرفق غير موجود: {attachment.path}")
+                attachment.missing = not exists
+            missing += not exists
+        checked += len(batch)
+        last_id = batch[-1].id
+        db.session.commit()
+    return checked, missing, filled
+
+def start_attachment_reconciler():
+    """تشغيل مدقق المرفقات في خيط خلفي كل ATTACHMENT_RECONCILE_INTERVAL ثانية"""
+    interval = app.config['ATTACHMENT_RECONCILE_INTERVAL']
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    checked, missing, filled = reconcile_attachments()
+                    logging.info(f"تم فحص {checked} مرفق: {missing} مفقود، واكتملت بيانات {filled}.")
+                except SQLAlchemyError as e:
+                    db.session.rollback()
+                    logging.warning(f"تعذر مطابقة المرفقات مع الملفات على القرص: {e}")
+            time.sleep(interval)
+
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
 class RequestForward(db.Model):
     __tablename__ = 'request_forwards'
     id = db.Column(db.Integer, primary_key=True)
@@ -2446,22 +3992,22 @@ def submit_request():
         return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
     
     try:
+        new_request = Request(
+            user_id=session['user_id'],
+            request_type=request.form['request_type'],
+            title=request.form['title'],
+            description=request.form['description']
+        )
+        
         # التحقق من الملفات المرفقة
         attachments = []
         if 'attachments' in request.files:
             files = request.files.getlist('attachments')
             for file in files:
                 if file and allowed_file(file.filename):
-                    filename = save_uploaded_file(file)
+                    filename = save_uploaded_file(file, request_obj=new_request)
                     attachments.append(filename)
-        
-        new_request = Request(
-            user_id=session['user_id'],
-            request_type=request.form['request_type'],
-            title=request.form['title'],
-            description=request.form['description'],
-            attachments=json.dumps(attachments) if attachments else None
-        )
+        new_request.attachments = json.dumps(attachments) if attachments else None
         
         db.session.add(new_request)
         db.session.commit()
@@ -2504,7 +4050,10 @@ def update_request(request_id):
             attachments = []
             for file in files:
                 if file and allowed_file(file.filename):
-                    filename = save_uploaded_file(file)
+                    if not attachments:
+                        # المرفقات الجديدة تحل محل القديمة، مع الاحتفاظ ببيانات الملفات القديمة
+                        Attachment.query.filter_by(request_id=request_obj.id).update({'request_id': None})
+                    filename = save_uploaded_file(file, request_obj=request_obj)
                     attachments.append(filename)
             if attachments:
                 request_obj.attachments = json.dumps(attachments)
@@ -2525,19 +4074,8 @@ def update_request(request_id):
         })
 
 @app.route('/process_request/<int:request_id>', methods=['POST'])
+@require_permissions(Permission.MANAGE_REQUESTS, 'ليس لديك صلاحية لمعالجة الطلبات')
 def process_request(request_id):
-    if 'user_id' not in session:
-        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
-    
-    # التحقق من صلاحيات المستخدم
-    allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-    user_roles = session['roles']
-    if not any(role in user_roles for role in allowed_roles):
-        return jsonify({
-            'success': False,
-            'message': 'ليس لديك صلاحية لمعالجة الطلبات'
-        })
-    
     request_obj = Request.query.get_or_404(request_id)
     
     try:
@@ -2574,16 +4112,15 @@ def get_requests():
         return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
     
     try:
-        # التحقق من صلاحيات المستخدم
-        allowed_roles = ['"governor"', '"general_admin"', '"central_admin"']
-        user_roles = session['roles']
-        
-        if any(role in user_roles for role in allowed_roles):
+        if has_permissions(Permission.MANAGE_REQUESTS):
             # للمدراء: عرض جميع الطلبات
-            requests = Request.query.order_by(Request.created_at.desc()).all()
+            query = Request.query
         else:
             # للمستخدمين العاديين: عرض طلباتهم فقط
-            requests = Request.query.filter_by(user_id=session['user_id']).order_by(Request.created_at.desc()).all()
+            query = Request.query.filter_by(user_id=session['user_id'])
+        # تحميل مقدم الطلب في نفس الاستعلام بدلاً من استعلام لكل طلب
+        query = query.options(joinedload(Request.user))
+        requests, next_cursor = keyset_page(query, Request.created_at, Request.id)
         
         requests_data = [{
             'id': req.id,
@@ -2600,8 +4137,11 @@ def get_requests():
         
         return jsonify({
             'success': True,
-            'data': requests_data
+            'data': requests_data,
+            'next_cursor': next_cursor
         })
+    except InvalidCursorError:
+        raise
     except Exception as e:
         logging.error(f"خطأ أثناء جلب الطلبات: {e}")
         return jsonify({
@@ -2612,6 +4152,10 @@ def get_requests():
 # نموذج المقابلات
 class Interview(db.Model):
     __tablename__ = 'interviews'
+    __table_args__ = (
+        db.Index('ix_interviews_interviewer_scheduled', 'interviewer_id', 'scheduled_date'),
+        db.Index('ix_interviews_candidate_scheduled', 'candidate_id', 'scheduled_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False)
     candidate_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -2630,19 +4174,8 @@ class Interview(db.Model):
     interviewer = db.relationship('User', foreign_keys=[interviewer_id], backref=db.backref('interviewer_interviews', lazy=True))
 
 @app.route('/schedule_interview', methods=['POST'])
+@require_permissions(Permission.MANAGE_INTERVIEWS, 'ليس لديك صلاحية لجدولة المقابلات')
 def schedule_interview():
-    if 'user_id' not in session:
-        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
-    
-    # التحقق من صلاحيات المستخدم
-    allowed_roles = ['"governor"', '"general_admin"', '"central_admin"', '"hr_admin"']
-    user_roles = session['roles']
-    if not any(role in user_roles for role in allowed_roles):
-        return jsonify({
-            'success': False,
-            'message': 'ليس لديك صلاحية لجدولة المقابلات'
-        })
-    
     try:
         # التحقق من تداخل المواعيد
         scheduled_date = datetime.strptime(request.form['scheduled_date'], '%Y-%m-%d %H:%M')
@@ -2689,19 +4222,8 @@ def schedule_interview():
         })
 
 @app.route('/update_interview/<int:interview_id>', methods=['POST'])
+@require_permissions(Permission.MANAGE_INTERVIEWS, 'ليس لديك صلاحية لتعديل المقابلات')
 def update_interview(interview_id):
-    if 'user_id' not in session:
-        return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
-    
-    # التحقق من صلاحيات المستخدم
-    allowed_roles = ['"governor"', '"general_admin"', '"central_admin"', '"hr_admin"']
-    user_roles = session['roles']
-    if not any(role in user_roles for role in allowed_roles):
-        return jsonify({
-            'success': False,
-            'message': 'ليس لديك صلاحية لتعديل المقابلات'
-        })
-    
     interview = Interview.query.get_or_404(interview_id)
     
     try:
@@ -2784,23 +4306,26 @@ def get_interviews():
         return jsonify({'success': False, 'message': 'يرجى تسجيل الدخول أولاً'})
     
     try:
-        # التحقق من صلاحيات المستخدم
-        allowed_roles = ['"governor"', '"general_admin"', '"central_admin"', '"hr_admin"']
-        user_roles = session['roles']
-        
-        if any(role in user_roles for role in allowed_roles):
+        if has_permissions(Permission.MANAGE_INTERVIEWS):
             # للمدراء: عرض جميع المقابلات
-            interviews = Interview.query.order_by(Interview.scheduled_date.desc()).all()
+            query = Interview.query
         else:
             # للمستخدمين العاديين: عرض مقابلاتهم فقط
-            interviews = Interview.query.filter(
+            query = Interview.query.filter(
                 (Interview.candidate_id == session['user_id']) |
                 (Interview.interviewer_id == session['user_id'])
-            ).order_by(Interview.scheduled_date.desc()).all()
+            )
+        # تحميل الوظيفة والمرشح والمقابل في نفس الاستعلام بدلاً من ثلاثة استعلامات لكل مقابلة
+        query = query.options(
+            joinedload(Interview.job).load_only(Job.id, Job.job_title),
+            joinedload(Interview.candidate).load_only(User.id, User.full_name),
+            joinedload(Interview.interviewer).load_only(User.id, User.full_name)
+        )
+        interviews, next_cursor = keyset_page(query, Interview.scheduled_date, Interview.id)
         
         interviews_data = [{
             'id': interview.id,
-            'job': interview.job.title,
+            'job': interview.job.job_title,
             'candidate': interview.candidate.full_name,
             'interviewer': interview.interviewer.full_name,
             'scheduled_date': interview.scheduled_date.strftime('%Y-%m-%d %H:%M'),
@@ -2815,8 +4340,11 @@ def get_interviews():
         
         return jsonify({
             'success': True,
-            'data': interviews_data
+            'data': interviews_data,
+            'next_cursor': next_cursor
         })
+    except InvalidCursorError:
+        raise
     except Exception as e:
         logging.error(f"خطأ أثناء جلب المقابلات: {e}")
         return jsonify({
@@ -2824,6 +4352,553 @@ def get_interviews():
             'message': 'حدث خطأ أثناء جلب المقابلات'
         })
 
+# أوامر سطر الأوامر
+@contextmanager
+def scratch_data():
+    """تشغيل أوامر الفحص والقياس على قاعدة SQLite ومجلد تحميل وذاكرة PDF مؤقتة حتى لا تكتب في البيانات الفعلية"""
+    global pdf_cache
+    import tempfile
+    from sqlalchemy import create_engine
+
+    # db.engines هو قاموس المحركات الخاص بالتطبيق، والجلسة تختار المحرك منه عند كل استعلام
+    engines = db.engines
+    saved_engine, saved_upload_folder, saved_pdf_cache = engines[None], app.config['UPLOAD_FOLDER'], pdf_cache
+    with tempfile.TemporaryDirectory() as folder:
+        db.session.remove()
+        engine = create_engine(f"sqlite:///{os.path.join(folder, 'scratch.db')}")
+        engines[None] = engine
+        app.config['UPLOAD_FOLDER'] = os.path.join(folder, 'uploads')
+        os.makedirs(app.config['UPLOAD_FOLDER'])
+        pdf_cache = PdfRenderCache(os.path.join(folder, 'pdf_cache'), app.config['PDF_CACHE_MEMORY_LIMIT'], app.config['PDF_CACHE_DISK_LIMIT'],
+                                   version=saved_pdf_cache.version)
+        try:
+            db.create_all()
+            yield folder
+        finally:
+            db.session.remove()
+            engine.dispose()
+            engines[None] = saved_engine
+            app.config['UPLOAD_FOLDER'] = saved_upload_folder
+            pdf_cache = saved_pdf_cache
+
+def sample_decision_data(data_type, text_size=1):
+    """بيانات قرار تجريبية لقياس الأداء، text_size يضاعف طول النصوص الطويلة"""
+    paragraph = 'نص تجريبي لقرار إداري يتضمن مواد وأحكام متعددة. ' * 10 * text_size
+
+    if data_type == 'appointment':
+        return {
+            'decision_number': '1/2025',
+            'decision_date': '2025-01-01',
+            'governorate': 'القاهرة',
+            'announcement_number': '10/2025',
+            'candidate_code': 'C-001',
+            'article_one_text': paragraph,
+            'article_two_text': paragraph,
+            'article_three_text': paragraph,
+            'competent_authority': 'محافظ القاهرة',
+            'authority_approval': 'معتمد',
+            'files': {'announcement_file': None, 'candidate_file': None, 'decision_file': None},
+            'type': 'appointment'
+        }
+
+    data = {
+        'decision_number': '1/2025',
+        'decision_date': '2025-01-01',
+        'governorate': 'القاهرة',
+        'preamble': paragraph,
+        'article_one_text': paragraph,
+        'article_two_text': paragraph,
+        'committee_tasks': paragraph,
+        'article_four': paragraph,
+        'competent_authority': 'محافظ القاهرة',
+        'authority_approval': 'معتمد'
+    }
+    for index, (role, _) in enumerate(COMMITTEE_ROLES):
+        data[f'{role}_name'] = f'عضو رقم {index + 1}'
+        data[f'{role}_national_id'] = f'2900101{index:07d}'
+        data[f'{role}_phone'] = f'010{index:08d}'
+    return data
+
+@app.cli.command('benchmark-pdf-renderer')
+@click.option('--repeat', default=10, help='عدد مرات التحويل لكل طريقة')
+def benchmark_pdf_renderer(repeat):
+    """مقارنة زمن التحويل قبل وبعد استخدام PdfRenderer"""
+    for data_type in ['committee', 'appointment']:
+        with app.test_request_context():
+            html_content = build_pdf_html(sample_decision_data(data_type), data_type)
+
+        # الطريقة السابقة: أنماط مضمنة داخل HTML يتم تحليلها مع كل تحويل
+        with open(os.path.join(app.static_folder, 'css', PdfRenderer.STYLESHEETS[data_type]), encoding='utf-8') as f:
+            inline_html = html_content.replace('</head>', f'<style>{f.read()}</style></head>', 1)
+
+        before = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            HTML(string=inline_html).write_pdf()
+            before.append(time.perf_counter() - start)
+
+        after = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pdf_renderer.render(html_content, data_type)
+            after.append(time.perf_counter() - start)
+
+        before_ms = statistics.median(before) * 1000
+        after_ms = statistics.median(after) * 1000
+        click.echo(f"{data_type}: قبل {before_ms:.1f} ms | بعد {after_ms:.1f} ms | تحسن {(1 - after_ms / before_ms) * 100:.1f}%")
+
+def measure_pdf_call(func, repeat):
+    """قياس زمن التنفيذ (الوسيط) وذروة الذاكرة وحجم الملف الناتج لدالة تعيد ملف PDF"""
+    import tracemalloc
+
+    timings = []
+    peak = 0
+    size = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = len(func())
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        'wall_ms': round(statistics.median(timings) * 1000, 2),
+        'peak_kb': round(peak / 1024, 1),
+        'size_bytes': size
+    }
+
+def create_benchmark_decision(data_type, user_id, text_size):
+    """إنشاء قرار مؤقت بحالة created ليتم عرضه عبر مسارات PDF"""
+    model = AppointmentDecision if data_type == 'appointment' else LeadershipCommittee
+    columns = model.__table__.columns.keys()
+    fields = {k: v for k, v in sample_decision_data(data_type, text_size).items() if k in columns}
+    fields.update(user_id=user_id, decision_date=date(2025, 1, 1), status='created')
+    decision = model(**fields)
+    if data_type == 'committee':
+        add_committee_with_members(decision, committee_members_from(sample_decision_data(data_type, text_size)))
+    else:
+        db.session.add(decision)
+    db.session.commit()
+    return decision
+
+@app.cli.command('benchmark-pdf')
+@click.option('--sizes', default='1,5,20', help='مضاعفات طول النصوص الطويلة مفصولة بفواصل')
+@click.option('--repeat', default=5, help='عدد مرات القياس لكل حالة')
+@click.option('--baseline', type=click.Path(dir_okay=False), help='ملف JSON بنتائج سابقة للمقارنة بها')
+@click.option('--save', type=click.Path(dir_okay=False), help='حفظ النتائج الحالية كخط أساس')
+@click.option('--tolerance', default=0.2, help='نسبة الزيادة المسموح بها قبل اعتبارها تراجعاً')
+def benchmark_pdf(sizes, repeat, baseline, save, tolerance):
+    """قياس أداء generate_pdf ومسارات PDF الثلاثة حسب نوع القرار وطول النص"""
+    # التحويل داخل العملية الحالية ليشمل قياس الذاكرة عملية التحويل نفسها
+    workers = app.config['PDF_RENDER_WORKERS']
+    app.config['PDF_RENDER_WORKERS'] = 0
+    results = {}
+
+    try:
+        with scratch_data():
+            user = User(full_name='benchmark', password_hash='-', email='benchmark@localhost',
+                        roles='"general_admin"', governorate='القاهرة', active=True)
+            db.session.add(user)
+            db.session.commit()
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user.id
+                sess['roles'] = user.roles
+                sess['governorate'] = user.governorate
+
+            for data_type in ['committee', 'appointment']:
+                for text_size in [int(s) for s in sizes.split(',')]:
+                    def call_generate_pdf():
+                        with app.test_request_context():
+                            session['governorate'] = user.governorate
+                            return generate_pdf(sample_decision_data(data_type, text_size), data_type).getvalue()
+                    results[f'{data_type}:{text_size}:generate_pdf'] = measure_pdf_call(call_generate_pdf, repeat)
+
+                    decision = create_benchmark_decision(data_type, user.id, text_size)
+                    for route in ['view_pdf', 'print_pdf', 'download_pdf']:
+                        def call_route():
+                            # إلغاء التخزين المؤقت حتى يتم قياس التحويل الفعلي في كل مرة
+                            pdf_cache.invalidate(data_type, user.id)
+                            response = client.get(f'/{route}?type={data_type}')
+                            if response.status_code != 200:
+                                raise click.ClickException(f'{route} أعاد الحالة {response.status_code}')
+                            return response.data
+                        results[f'{data_type}:{text_size}:{route}'] = measure_pdf_call(call_route, repeat)
+                    # حذف القرار حتى لا يكون هو الأحدث في الحالة التالية
+                    db.session.delete(decision)
+                    db.session.commit()
+    finally:
+        app.config['PDF_RENDER_WORKERS'] = workers
+
+    for name, result in results.items():
+        click.echo(f"{name:<40} {result['wall_ms']:>10.1f} ms {result['peak_kb']:>10.1f} KB {result['size_bytes']:>10} bytes")
+
+    if save:
+        with open(save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        click.echo(f"تم حفظ النتائج في {save}")
+
+    if baseline:
+        with open(baseline, encoding='utf-8') as f:
+            baseline_results = json.load(f)
+        regressions = []
+        for name, result in results.items():
+            for metric, value in result.items():
+                previous = baseline_results.get(name, {}).get(metric)
+                if previous and value > previous * (1 + tolerance):
+                    regressions.append(f"{name} {metric}: {previous} -> {value} (+{(value / previous - 1) * 100:.0f}%)")
+        if regressions:
+            click.echo('تراجع في الأداء مقارنة بخط الأساس:')
+            for line in regressions:
+                click.echo(f'  {line}')
+            sys.exit(1)
+        click.echo('لا يوجد تراجع في الأداء مقارنة بخط الأساس.')
+
+@app.cli.command('pdf-font-sizes')
+@click.option('--text-size', default=1, help='مضاعف طول النصوص الطويلة')
+def pdf_font_sizes(text_size):
+    """مقارنة حجم ملفات القرارات مع تضمين الخطوط كاملة ومع تضمين الحروف المستخدمة فقط"""
+    for data_type in ['committee', 'appointment']:
+        with app.test_request_context():
+            html_content = build_pdf_html(sample_decision_data(data_type, text_size), data_type)
+
+        full_size = len(pdf_renderer.render(html_content, data_type, full_fonts=True))
+        subset_size = len(pdf_renderer.render(html_content, data_type, full_fonts=False))
+        click.echo(f"{data_type}: خطوط كاملة {full_size / 1024:.1f} KB | حروف مستخدمة فقط {subset_size / 1024:.1f} KB | توفير {(1 - subset_size / full_size) * 100:.1f}%")
+
+def hot_query_plans():
+    """الاستعلامات الأكثر استخداماً مع الفهارس المتوقع استخدامها في كل منها"""
+    now = datetime.utcnow()
+    return [
+        ('latest_committee', ['ix_leadership_committees_user_status_created'],
+         LeadershipCommittee.query.filter_by(status='created', user_id=1).order_by(LeadershipCommittee.created_at.desc())),
+        ('latest_appointment', ['ix_appointment_decisions_user_status_created'],
+         AppointmentDecision.query.filter_by(status='created', user_id=1).order_by(AppointmentDecision.created_at.desc())),
+        ('user_requests', ['ix_requests_user_created'],
+         Request.query.filter_by(user_id=1).order_by(Request.created_at.desc())),
+        ('job_status_history', ['ix_job_statuses_job_created'],
+         JobStatus.query.filter_by(job_id=1).order_by(JobStatus.created_at.desc())),
+        ('interviewer_schedule', ['ix_interviews_interviewer_scheduled'],
+         Interview.query.filter(Interview.interviewer_id == 1, Interview.scheduled_date <= now)),
+        ('user_interviews', ['ix_interviews_interviewer_scheduled', 'ix_interviews_candidate_scheduled'],
+         Interview.query.filter((Interview.candidate_id == 1) | (Interview.interviewer_id == 1))),
+        ('program_registrations', ['ix_training_registrations_program_status'],
+         TrainingRegistration.query.filter_by(program_id=1, status='approved')),
+        ('jobs_by_status', ['ix_jobs_status'],
+         Job.query.filter_by(status='pending')),
+        ('user_jobs', ['ix_jobs_user_id'],
+         Job.query.filter_by(user_id=1))
+    ]
+
+def explain_query_plan(query):
+    """تنفيذ EXPLAIN QUERY PLAN على استعلام SQLAlchemy وإرجاع أسطر الخطة"""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+    return [row[-1] for row in rows]
+
+@app.cli.command('check-query-plans')
+def check_query_plans():
+    """التحقق من أن الاستعلامات الأكثر استخداماً تستخدم الفهارس بدلاً من فحص الجداول كاملة"""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('هذا الأمر يدعم قواعد بيانات SQLite فقط')
+
+    failures = 0
+    for name, indexes, query in hot_query_plans():
+        plan = explain_query_plan(query)
+        problems = [f'الفهرس {index} غير مستخدم' for index in indexes if not any(index in line for line in plan)]
+        problems += [line for line in plan if line.startswith('SCAN') and 'INDEX' not in line]
+        problems += [line for line in plan if 'TEMP B-TREE' in line]
+
+        click.echo(f"{'✗' if problems else '✓'} {name}")
+        for line in plan:
+            click.echo(f'    {line}')
+        for problem in problems:
+            click.echo(f'    ! {problem}')
+        failures += bool(problems)
+
+    if failures:
+        click.echo(f'{failures} استعلام لا يستخدم الفهارس المتوقعة.')
+        sys.exit(1)
+    click.echo('جميع الاستعلامات تستخدم الفهارس المتوقعة.')
+
+@app.cli.command('benchmark-sqlite')
+@click.option('--threads', default=8, help='عدد الخيوط المتزامنة')
+@click.option('--seconds', default=5.0, help='مدة القياس لكل وضع بالثواني')
+@click.option('--write-ratio', default=0.2, help='نسبة عمليات الكتابة من إجمالي العمليات')
+def benchmark_sqlite(threads, seconds, write_ratio):
+    """مقارنة عدد عمليات القراءة والكتابة المتزامنة في الثانية بين أوضاع SQLite"""
+    import random
+    import tempfile
+    from sqlalchemy import create_engine, text
+
+    for mode, pragmas in SQLITE_ENGINE_MODES.items():
+        with tempfile.TemporaryDirectory() as folder:
+            engine = create_engine(f"sqlite:///{os.path.join(folder, 'benchmark.db')}", pool_size=threads, max_overflow=0)
+            db.event.listen(engine, 'connect', lambda dbapi_connection, _, pragmas=pragmas: apply_sqlite_pragmas(dbapi_connection, pragmas))
+
+            with engine.begin() as conn:
+                conn.execute(text('CREATE TABLE items (id INTEGER PRIMARY KEY, user_id INTEGER, status TEXT, created_at TEXT)'))
+                conn.execute(text('CREATE INDEX ix_items_user ON items (user_id, created_at)'))
+                conn.execute(
+                    text('INSERT INTO items (user_id, status, created_at) VALUES (:user_id, :status, :created_at)'),
+                    [{'user_id': i % 50, 'status': 'draft', 'created_at': datetime.utcnow().isoformat()} for i in range(5000)]
+                )
+
+            counts = {'reads': 0, 'writes': 0, 'errors': 0}
+            counts_lock = Lock()
+            deadline = time.perf_counter() + seconds
+
+            def worker():
+                local = {'reads': 0, 'writes': 0, 'errors': 0}
+                while time.perf_counter() < deadline:
+                    try:
+                        if random.random() < write_ratio:
+                            with engine.begin() as conn:
+                                conn.execute(
+                                    text('INSERT INTO items (user_id, status, created_at) VALUES (:user_id, :status, :created_at)'),
+                                    {'user_id': random.randrange(50), 'status': 'created', 'created_at': datetime.utcnow().isoformat()}
+                                )
+                            local['writes'] += 1
+                        else:
+                            with engine.connect() as conn:
+                                conn.execute(
+                                    text('SELECT * FROM items WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 20'),
+                                    {'user_id': random.randrange(50)}
+                                ).fetchall()
+                            local['reads'] += 1
+                    except SQLAlchemyError:
+                        local['errors'] += 1
+                with counts_lock:
+                    for name, value in local.items():
+                        counts[name] += value
+
+            workers = [Thread(target=worker) for _ in range(threads)]
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+            engine.dispose()
+
+        click.echo(
+            f"{mode:<12} قراءة {counts['reads'] / seconds:>9.0f}/ث | كتابة {counts['writes'] / seconds:>8.0f}/ث | "
+            f"أخطاء {counts['errors']}"
+        )
+
+@app.cli.command('check-database')
+def check_database():
+    """تنفيذ استعلام على كل جدول وعلى الاستعلامات الأكثر استخداماً للتحقق من توافقها مع قاعدة البيانات الحالية"""
+    click.echo(f"قاعدة البيانات: {db.engine.url.render_as_string(hide_password=True)}")
+    checks = [(mapper.class_.__name__, mapper.class_.query) for mapper in db.Model.registry.mappers]
+    checks += [(name, query) for name, _, query in hot_query_plans()]
+
+    failures = 0
+    for name, query in checks:
+        try:
+            query.first()
+            click.echo(f'✓ {name}')
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            click.echo(f'✗ {name}: {e}')
+            failures += 1
+    db.session.rollback()
+
+    if failures:
+        sys.exit(1)
+    click.echo('جميع الاستعلامات تعمل على قاعدة البيانات الحالية.')
+
+# الحد الأقصى لعدد استعلامات SQL لكل مسار (بما فيها قراءة الجلسة)، ويجب ألا يتغير العدد بزيادة عدد الصفوف
+QUERY_COUNT_LIMITS = {
+    'get_requests': 2,
+    'get_interviews': 2,
+    'inbox': 3,  # الجلسة والمعاملات وبيانات مرفقاتها
+    'report_evaluations': 2,
+    'report_training': 2,
+    'report_requests': 2
+}
+
+def count_queries(func):
+    """تنفيذ دالة وإرجاع عدد استعلامات SQL التي نفذتها"""
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        func()
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements)
+
+def create_query_count_data(rows):
+    """إنشاء بيانات بعدد الصفوف المطلوب لكل مسار (داخل scratch_data) وإرجاع المستخدم المدير"""
+    suffix = uuid.uuid4().hex
+    admin = User(full_name='query-count', password_hash='-', email=f'query-count-{suffix}@localhost',
+                 roles='"general_admin"', governorate='القاهرة', active=True)
+    users = [User(full_name=f'query-count {i}', password_hash='-', email=f'query-count-{suffix}-{i}@localhost',
+                  roles='"employee"', governorate='القاهرة', active=True) for i in range(rows)]
+    db.session.add_all([admin] + users)
+    db.session.flush()
+
+    job = Job(user_id=admin.id, job_title='query-count', job_code=f'QC-{suffix}', job_description='-',
+              deadline=date.today(), governorate='القاهرة')
+    db.session.add(job)
+    db.session.flush()
+
+    created = []
+    for i, user in enumerate(users):
+        attachment = secure_filename(f'query-count-{suffix}-{i}.pdf')
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], attachment)
+        with open(file_path, 'wb') as f:
+            f.write(b'%PDF-1.4')
+        admin_request = Request(user_id=admin.id, request_type='leave', title=f'query-count {i}', description='-',
+                                attachments=json.dumps([attachment]))
+
+        program = TrainingProgram(title=f'query-count {i}', description='-', start_date=date.today(), end_date=date.today(),
+                                  location='-', capacity=rows, created_by=admin.id)
+        db.session.add(program)
+        db.session.flush()
+        created += [
+            admin_request,
+            Attachment(request=admin_request, filename=attachment, size=os.path.getsize(file_path),
+                       mime_type=guess_mime_type(attachment), checksum=file_checksum(file_path), uploaded_by=admin.id),
+            Request(user_id=user.id, request_type='leave', title=f'query-count {i}', description='-'),
+            Interview(job_id=job.id, candidate_id=user.id, interviewer_id=admin.id,
+                      scheduled_date=datetime.utcnow(), duration=30, location='-'),
+            Evaluation(user_id=user.id, evaluator_id=admin.id, performance_score=1, skills_score=1,
+                       behavior_score=1, attendance_score=1, overall_score=1),
+            program,
+            TrainingRegistration(program_id=program.id, user_id=user.id)
+        ]
+    db.session.add_all(created)
+    db.session.commit()
+    return admin
+
+def measure_query_counts(admin):
+    """قياس عدد الاستعلامات في كل مسار باستخدام جلسة المستخدم المدير"""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin.id
+        sess['roles'] = admin.roles
+        sess['full_name'] = admin.full_name
+        sess['governorate'] = admin.governorate
+        sess['permissions'] = permissions_for_roles(admin.roles)
+        sess.permanent = True
+
+    today = date.today().strftime('%Y-%m-%d')
+    tomorrow = (date.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+    calls = {
+        'get_requests': lambda: client.get('/get_requests'),
+        'get_interviews': lambda: client.get('/get_interviews'),
+        'inbox': lambda: client.get('/inbox'),
+        'report_evaluations': lambda: client.post('/generate_report', data={'report_type': 'evaluations', 'start_date': today, 'end_date': tomorrow, 'output_format': 'csv'}),
+        'report_training': lambda: client.post('/generate_report', data={'report_type': 'training', 'start_date': today, 'end_date': tomorrow, 'output_format': 'csv'}),
+        'report_requests': lambda: client.post('/generate_report', data={'report_type': 'requests', 'start_date': today, 'end_date': tomorrow, 'output_format': 'csv'})
+    }
+
+    counts = {}
+    for name, call in calls.items():
+        def request_and_read():
+            # المسارات تعمل داخل سياق التطبيق الحالي، لذا يجب تفريغ الجلسة حتى لا تُقرأ العلاقات من الذاكرة
+            db.session.expunge_all()
+            response = call()
+            response.get_data()
+            if response.status_code != 200:
+                raise click.ClickException(f'{name} أعاد الحالة {response.status_code}')
+        counts[name] = count_queries(request_and_read)
+    return counts
+
+@app.cli.command('check-query-counts')
+@click.option('--rows', default='2,20', help='أعداد الصفوف المستخدمة في القياس مفصولة بفواصل')
+def check_query_counts(rows):
+    """التحقق من أن عدد استعلامات SQL في المسارات التي تعرض علاقات ثابت ولا يزيد بزيادة عدد الصفوف"""
+    results = {}
+    for row_count in [int(r) for r in rows.split(',')]:
+        with scratch_data():
+            results[row_count] = measure_query_counts(create_query_count_data(row_count))
+
+    failures = 0
+    for name, limit in QUERY_COUNT_LIMITS.items():
+        counts = [results[row_count][name] for row_count in results]
+        problems = []
+        if max(counts) > limit:
+            problems.append(f'تجاوز الحد الأقصى {limit}')
+        if len(set(counts)) > 1:
+            problems.append('يزداد عدد الاستعلامات بزيادة عدد الصفوف')
+        click.echo(f"{'✗' if problems else '✓'} {name}: " + ' | '.join(f'{row_count} صف: {results[row_count][name]}' for row_count in results))
+        for problem in problems:
+            click.echo(f'    ! {problem}')
+        failures += bool(problems)
+
+    if failures:
+        click.echo(f'{failures} مسار يتجاوز عدد الاستعلامات المسموح به.')
+        sys.exit(1)
+    click.echo('جميع المسارات تنفذ عدداً ثابتاً من الاستعلامات.')
+
+@app.cli.command('rebuild-statistics')
+def rebuild_statistics():
+    """إعادة حساب عدادات الإحصائيات من الجداول مباشرة"""
+    counters = compute_stat_counters()
+    StatCounter.query.delete()
+    db.session.add_all(StatCounter(name=name, value=value) for name, value in counters.items())
+    db.session.commit()
+    cache.invalidate_tags('statistics')
+    for name, value in sorted(counters.items()):
+        click.echo(f'{name:<50} {value}')
+    click.echo(f'تمت إعادة بناء {len(counters)} عداد.')
+
+@app.cli.command('build-password-filter')
+@click.option('--source', type=click.Path(exists=True, dir_okay=False), help='قائمة كلمات المرور (الافتراضي PASSWORD_BLOCKLIST_FILE)')
+@click.option('--output', type=click.Path(dir_okay=False), help='ملف المرشح الناتج (الافتراضي PASSWORD_FILTER_FILE)')
+@click.option('--false-positive-rate', default=None, type=float, help='نسبة الإيجابية الخاطئة المقبولة')
+def build_password_filter_command(source, output, false_positive_rate):
+    """بناء مرشح Bloom لكلمات المرور الشائعة من القائمة المرفقة"""
+    source = source or app.config['PASSWORD_BLOCKLIST_FILE']
+    output = output or app.config['PASSWORD_FILTER_FILE']
+    false_positive_rate = false_positive_rate or app.config['PASSWORD_FILTER_FALSE_POSITIVE_RATE']
+
+    bloom, count = build_password_filter(source, false_positive_rate)
+    with open(output, 'wb') as f:
+        f.write(bloom.to_bytes())
+    click.echo(f'{count} كلمة مرور | {bloom.size} بت | {bloom.hash_count} دوال تجزئة | {os.path.getsize(output)} بايت -> {output}')
+
+@app.cli.command('benchmark-password-hash')
+@click.option('--methods', default='pbkdf2:sha256:600000,pbkdf2:sha256:1000000,scrypt:16384:8:1,scrypt:32768:8:1,scrypt:65536:8:1',
+              help='طرق التجزئة المراد قياسها مفصولة بفواصل')
+@click.option('--seconds', default=2.0, help='مدة القياس لكل طريقة بالثواني')
+def benchmark_password_hash(methods, seconds):
+    """قياس عدد عمليات تجزئة كلمات المرور في الثانية لكل طريقة وعامل تكلفة"""
+    current = password_hash_prefix(app.config['PASSWORD_HASH_METHOD'])
+    for method in methods.split(','):
+        timings = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline or len(timings) < 3:
+            start = time.perf_counter()
+            generate_password_hash('benchmark-password', method=method, salt_length=app.config['PASSWORD_SALT_LENGTH'])
+            timings.append(time.perf_counter() - start)
+        median_ms = statistics.median(timings) * 1000
+        marker = ' (الحالية)' if password_hash_prefix(method) == current else ''
+        click.echo(f'{method:<28} {1000 / median_ms:>8.1f} تجزئة/ثانية {median_ms:>9.1f} ms{marker}')
+
+@app.cli.command('sweep-sessions')
+def sweep_sessions():
+    """حذف الجلسات المنتهية من جدول الجلسات"""
+    deleted = sweep_expired_sessions()
+    remaining = ServerSession.query.count()
+    click.echo(f'تم حذف {deleted} جلسة منتهية، والمتبقي {remaining} جلسة.')
+
+@app.cli.command('init-db')
+def init_db_command():
+    """إنشاء الجداول أو تطبيق الترحيلات المتبقية وإضافة بيانات العينة (يتم تلقائياً عند تشغيل app.py مباشرة)"""
+    init_db()
+    click.echo('تم تجهيز قاعدة البيانات.')
+
+@app.cli.command('reconcile-attachments')
+@click.option('--batch-size', default=500, help='عدد المرفقات المفحوصة في كل دفعة')
+def reconcile_attachments_command(batch_size):
+    """مطابقة جدول المرفقات مع الملفات على القرص وتحديد الملفات المفقودة"""
+    checked, missing, filled = reconcile_attachments(batch_size)
+    click.echo(f'تم فحص {checked} مرفق: {missing} مفقود، واكتملت بيانات {filled}.')
+
 # معالجة الأخطاء
 @app.errorhandler(400)
 def bad_request(error):
@@ -2964,6 +5039,19 @@ def handle_status_validation_error(error):
         'error': 'خطأ في التحقق من الحالة'
     }), 400
 
+# معالجة أخطاء مؤشر الصفحات
+class InvalidCursorError(Exception):
+    pass
+
+@app.errorhandler(InvalidCursorError)
+def handle_invalid_cursor_error(error):
+    logging.error(f"خطأ في مؤشر الصفحة: {error}")
+    return jsonify({
+        'success': False,
+        'message': str(error),
+        'error': 'خطأ في مؤشر الصفحة'
+    }), 400
+
 # إضافة تعريفات الأخطاء المخصصة
 class ConfigurationError(Exception):
     pass
@@ -2971,14 +5059,16 @@ class ConfigurationError(Exception):
 class DatabaseError(Exception):
     pass
 
-# تهيئة قاعدة البيانات بعد تعريف جميع النماذج
-init_db()
-
 if __name__ == "__main__":
+    # مطلوب لعمليات خدمة التحويل في النسخة المجمعة (frozen) على Windows
+    multiprocessing.freeze_support()
     try:
         # تهيئة قاعدة البيانات
         init_db()
         
+        # مطابقة المرفقات مع الملفات على القرص في الخلفية
+        start_attachment_reconciler()
+        
         # تشغيل الخادم في خلفية منفصلة
         def start_server():
             app.run(host='127.0.0.1', port=5000, debug=False)
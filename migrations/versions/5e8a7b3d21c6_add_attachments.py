@@ -0,0 +1,76 @@
+"""add attachments
+
+Revision ID: 5e8a7b3d21c6
+Revises: c41d8e2a9f07
+Create Date: 2026-10-17 05:12:38.402917
+
+"""
+import json
+import mimetypes
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a7b3d21c6'
+down_revision = 'c41d8e2a9f07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    attachments = op.create_table('attachments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('request_id', sa.Integer(), nullable=True),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('folder', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('mime_type', sa.String(length=100), nullable=False),
+    sa.Column('checksum', sa.String(length=64), nullable=True),
+    sa.Column('uploaded_by', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('missing', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ),
+    sa.ForeignKeyConstraint(['uploaded_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.create_index('ix_attachments_request_missing', ['request_id', 'missing'], unique=False)
+
+    # Backfill from the JSON attachments column. Size and checksum are left
+    # empty; `flask reconcile-attachments` fills them and flags missing files.
+    rows = []
+    requests_table = sa.table('requests',
+        sa.column('id', sa.Integer()),
+        sa.column('user_id', sa.Integer()),
+        sa.column('created_at', sa.DateTime()),
+        sa.column('attachments', sa.Text())
+    )
+    requests = op.get_bind().execute(sa.select(
+        requests_table.c.id, requests_table.c.user_id, requests_table.c.created_at, requests_table.c.attachments
+    ).where(requests_table.c.attachments.isnot(None)))
+    for request_id, user_id, created_at, value in requests:
+        try:
+            filenames = json.loads(value)
+        except ValueError:
+            continue
+        for filename in filenames or []:
+            rows.append({
+                'request_id': request_id,
+                'filename': filename,
+                'folder': '',
+                'mime_type': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                'uploaded_by': user_id,
+                'created_at': created_at,
+                'missing': False
+            })
+    if rows:
+        op.bulk_insert(attachments, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('attachments', schema=None) as batch_op:
+        batch_op.drop_index('ix_attachments_request_missing')
+
+    op.drop_table('attachments')
@@ -0,0 +1,95 @@
+"""move committee members into committee_members
+
+Revision ID: 6d9ba36976e2
+Revises: 15e65bd86209
+Create Date: 2026-10-17 04:32:31.481459
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d9ba36976e2'
+down_revision = '15e65bd86209'
+branch_labels = None
+depends_on = None
+
+# Member roles, in the order they were stored as flat columns on leadership_committees.
+ROLES = [
+    'chairperson', 'admin_member', 'hr_member', 'it_member', 'legal_member',
+    'other_member_1', 'other_member_2', 'secretary', 'secretary_member_1', 'secretary_member_2'
+]
+FIELDS = [('name', 100), ('national_id', 14), ('phone', 11)]
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    members = op.create_table(
+        'committee_members',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('committee_id', sa.Integer(), nullable=False),
+        sa.Column('role', sa.String(length=50), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('national_id', sa.String(length=14), nullable=False),
+        sa.Column('phone', sa.String(length=11), nullable=False),
+        sa.ForeignKeyConstraint(['committee_id'], ['leadership_committees.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('committee_id', 'role', name='uq_committee_members_committee_role')
+    )
+
+    # Copy the flat member columns of every existing committee into child rows.
+    committees = sa.table(
+        'leadership_committees',
+        sa.column('id', sa.Integer),
+        *[sa.column(f'{role}_{field}', sa.String) for role in ROLES for field, _ in FIELDS]
+    )
+    connection = op.get_bind()
+    result = connection.execute(sa.select(committees).order_by(committees.c.id))
+    while True:
+        rows = result.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        op.bulk_insert(members, [
+            {
+                'committee_id': row.id,
+                'role': role,
+                **{field: getattr(row, f'{role}_{field}') or '' for field, _ in FIELDS}
+            }
+            for row in rows for role in ROLES
+        ])
+
+    with op.batch_alter_table('leadership_committees', schema=None) as batch_op:
+        for role in ROLES:
+            for field, _ in FIELDS:
+                batch_op.drop_column(f'{role}_{field}')
+
+
+def downgrade():
+    with op.batch_alter_table('leadership_committees', schema=None) as batch_op:
+        for role in ROLES:
+            for field, length in FIELDS:
+                batch_op.add_column(sa.Column(f'{role}_{field}', sa.String(length=length), nullable=False, server_default=''))
+
+    committees = sa.table(
+        'leadership_committees',
+        sa.column('id', sa.Integer),
+        *[sa.column(f'{role}_{field}', sa.String) for role in ROLES for field, _ in FIELDS]
+    )
+    members = sa.table(
+        'committee_members',
+        sa.column('committee_id', sa.Integer),
+        sa.column('role', sa.String),
+        *[sa.column(field, sa.String) for field, _ in FIELDS]
+    )
+    connection = op.get_bind()
+    for member in connection.execute(sa.select(members)).fetchall():
+        if member.role not in ROLES:
+            continue
+        connection.execute(
+            committees.update()
+            .where(committees.c.id == member.committee_id)
+            .values({f'{member.role}_{field}': getattr(member, field) for field, _ in FIELDS})
+        )
+
+    op.drop_table('committee_members')
@@ -0,0 +1,64 @@
+"""add stat_counters
+
+Revision ID: 9b3f1c2d7e54
+Revises: 6d9ba36976e2
+Create Date: 2026-10-17 04:45:12.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3f1c2d7e54'
+down_revision = '6d9ba36976e2'
+branch_labels = None
+depends_on = None
+
+users = sa.table('users', sa.column('id', sa.Integer()), sa.column('active', sa.Boolean()), sa.column('roles', sa.String()))
+jobs = sa.table('jobs', sa.column('id', sa.Integer()), sa.column('status', sa.String()))
+evaluations = sa.table('evaluations', sa.column('id', sa.Integer()), sa.column('status', sa.String()),
+                       sa.column('overall_score', sa.Float()))
+training_programs = sa.table('training_programs', sa.column('id', sa.Integer()), sa.column('status', sa.String()))
+training_registrations = sa.table('training_registrations', sa.column('id', sa.Integer()))
+
+
+def counter_name(prefix, column=None):
+    # String + String compiles to the backend's concatenation (||, CONCAT() or +).
+    # NULL groups become 'None', matching the keys written by the runtime hooks.
+    name = sa.literal(prefix, sa.String())
+    return name if column is None else name + sa.func.coalesce(column, 'None')
+
+
+def counter_queries():
+    """Initial counter values, computed from the existing rows."""
+    count = sa.func.count()
+    return [
+        sa.select(counter_name('users.total'), count).select_from(users),
+        sa.select(counter_name('users.active'), count).select_from(users).where(users.c.active == sa.true()),
+        sa.select(counter_name('users.by_role:', users.c.roles), count).group_by(users.c.roles),
+        sa.select(counter_name('jobs.total'), count).select_from(jobs),
+        sa.select(counter_name('jobs.by_status:', jobs.c.status), count).group_by(jobs.c.status),
+        sa.select(counter_name('evaluations.total'), count).select_from(evaluations),
+        sa.select(counter_name('evaluations.by_status:', evaluations.c.status), count).group_by(evaluations.c.status),
+        sa.select(counter_name('evaluations.score_sum'), sa.func.coalesce(sa.func.sum(evaluations.c.overall_score), 0)),
+        sa.select(counter_name('training.total_programs'), count).select_from(training_programs),
+        sa.select(counter_name('training.active_programs'), count).select_from(training_programs)
+            .where(training_programs.c.status == 'active'),
+        sa.select(counter_name('training.total_registrations'), count).select_from(training_registrations),
+    ]
+
+
+def upgrade():
+    stat_counters = op.create_table('stat_counters',
+    sa.Column('name', sa.String(length=150), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    for query in counter_queries():
+        op.execute(stat_counters.insert().from_select(['name', 'value'], query))
+
+
+def downgrade():
+    op.drop_table('stat_counters')
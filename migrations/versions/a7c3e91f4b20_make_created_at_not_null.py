@@ -0,0 +1,43 @@
+"""make created_at not null on paginated tables
+
+Revision ID: a7c3e91f4b20
+Revises: 5e8a7b3d21c6
+Create Date: 2026-10-17 05:16:02.771430
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e91f4b20'
+down_revision = '5e8a7b3d21c6'
+branch_labels = None
+depends_on = None
+
+# Tables paginated by (created_at, id); keyset cursors cannot represent NULL.
+TABLES = ['users', 'jobs', 'requests']
+
+
+def upgrade():
+    # Rows without a creation time get requests.updated_at where available,
+    # otherwise the migration time (UTC, like the column default).
+    now = datetime.utcnow()
+    for name in TABLES:
+        columns = [sa.column('created_at', sa.DateTime())]
+        if name == 'requests':
+            columns.append(sa.column('updated_at', sa.DateTime()))
+        table = sa.table(name, *columns)
+        value = sa.func.coalesce(table.c.updated_at, now) if name == 'requests' else now
+        op.execute(table.update().where(table.c.created_at.is_(None)).values(created_at=value))
+
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for name in reversed(TABLES):
+        with op.batch_alter_table(name, schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
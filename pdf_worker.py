@@ -0,0 +1,74 @@
+# خدمة تحويل ملفات PDF داخل عمليات منفصلة
+# هذه الوحدة لا تستورد app حتى لا تعيد عمليات التحويل تهيئة التطبيق وقاعدة البيانات عند تشغيلها
+import logging
+import os
+import pathlib
+
+from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
+
+# محول PDF طويل العمر يتم إنشاؤه مرة واحدة لكل عملية
+class PdfRenderer:
+    """يحتفظ بأوراق الأنماط المترجمة وإعدادات الخطوط المشتركة لجميع عمليات التحويل"""
+
+    STYLESHEETS = {
+        'committee': 'pdf_template.css',
+        'appointment': 'appointment_pdf_template.css'
+    }
+
+    def __init__(self, css_folder, base_url, font_files=None, full_fonts=False, hinting=False):
+        self.base_url = base_url
+        self.full_fonts = full_fonts
+        self.hinting = hinting
+        self.font_config = FontConfiguration()
+        # ذاكرة مشتركة للصور (الشعارات) حتى لا يتم فك ترميزها مع كل تحويل
+        self.cache = {}
+
+        # تسجيل ملفات الخطوط عبر @font-face في إعدادات الخطوط المشتركة
+        # font_files: {العائلة: مسار الملف} أو {العائلة: {الوزن: مسار الملف}}
+        font_faces = []
+        for family, files in (font_files or {}).items():
+            for weight, path in (files.items() if isinstance(files, dict) else [('normal', files)]):
+                if os.path.exists(path):
+                    font_faces.append(f"@font-face {{ font-family: '{family}'; font-weight: {weight}; "
+                                      f"src: url('{pathlib.Path(path).resolve().as_uri()}'); }}")
+                else:
+                    logging.warning(f"ملف الخط {path} غير موجود، سيتم استخدام خطوط النظام للخط {family} ({weight}).")
+        self.font_stylesheets = [CSS(string='\n'.join(font_faces), font_config=self.font_config)] if font_faces else []
+
+        self.stylesheets = {
+            data_type: CSS(filename=os.path.join(css_folder, filename), font_config=self.font_config, base_url=base_url)
+            for data_type, filename in self.STYLESHEETS.items()
+        }
+
+    def render(self, html_content, data_type=None, full_fonts=None):
+        stylesheets = self.font_stylesheets + ([self.stylesheets[data_type]] if data_type in self.stylesheets else [])
+        return HTML(string=html_content, base_url=self.base_url).write_pdf(
+            stylesheets=stylesheets,
+            font_config=self.font_config,
+            full_fonts=self.full_fonts if full_fonts is None else full_fonts,
+            hinting=self.hinting,
+            cache=self.cache
+        )
+
+    def warm_up(self):
+        """تحويل مستند صغير لتحميل الخطوط وتجهيزها قبل أول طلب فعلي"""
+        for data_type in self.STYLESHEETS:
+            self.render('<html dir="rtl"><body><p>قرار 0123456789</p></body></html>', data_type)
+
+# المحول الخاص بالعملية الحالية (يتم إنشاؤه بواسطة init_pdf_worker)
+pdf_renderer = None
+
+def init_pdf_worker(settings):
+    """إنشاء محول مستقل داخل كل عملية من عمليات خدمة التحويل
+    settings: معاملات PdfRenderer (مسارات ملفات الأنماط والموارد والخطوط)"""
+    global pdf_renderer
+    pdf_renderer = PdfRenderer(**settings)
+    try:
+        pdf_renderer.warm_up()
+    except Exception as e:
+        logging.warning(f"تعذر تجهيز الخطوط في عملية التحويل: {e}")
+
+# تحويل HTML إلى PDF (تعمل داخل عمليات خدمة التحويل)
+def render_html_to_pdf(html_content, data_type=None):
+    return pdf_renderer.render(html_content, data_type)